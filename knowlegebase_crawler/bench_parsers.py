@@ -0,0 +1,171 @@
+import argparse
+import glob
+import html
+import json
+import os
+import sys
+import time
+
+from case_parsers import HEADER_MAPPING, FastParser, SoupParser, get_parser
+
+CASE_FIELDS = ('case_id', 'case_summary', 'case_date', 'case_gist')
+
+
+def load_fixtures(directory):
+    """Loads recorded pages from `directory/detail/*.html` and `directory/list/*.html`."""
+    pages = {}
+    for kind in ('detail', 'list'):
+        pages[kind] = []
+        for path in sorted(glob.glob(os.path.join(directory, kind, '*.html'))):
+            with open(path, 'r', encoding='utf-8') as f:
+                pages[kind].append((path, f.read()))
+    return pages
+
+
+def render_detail_page(case):
+    """Renders a crawled case back into the detail page layout."""
+    labels = {field: label for label, field in HEADER_MAPPING.items()}
+    rows = []
+    for field in CASE_FIELDS:
+        if field in case:
+            value = html.escape(case[field]).replace('\r\n', '<br>\r\n')
+            rows.append(
+                f'<div class="row"><div class="col-th">{labels[field]}</div>'
+                f'<div class="col-td jud_content"><div class="text-pre">\n  {value}\n</div></div></div>'
+            )
+    rows.append('<div class="row"><div class="col-th">歷審裁判：</div><div class="col-td"><!-- 前審 --><a href="#">連結</a></div></div>')
+    return (
+        '<html><head><script>var x = "<div class=\'int-table\'>";</script></head><body>'
+        '<div id="jud" class="int-table">' + ''.join(rows) + '</div>'
+        '<div class="htmlcontent">' + '<p>本文</p>' * 50 + '</div></body></html>'
+    )
+
+
+def render_list_page(case_ids, has_next):
+    links = ''.join(
+        f'<tr><td><a id="hlTitle" class="hlTitle_scroll" href="data.aspx?ty=JD&amp;id={html.escape(case_id)}">{html.escape(case_id)}</a></td></tr>'
+        for case_id in case_ids
+    )
+    pager = '<a href="#">上一頁</a><a id="hlNext" href="#">下一頁</a>' if has_next else '<a href="#">上一頁</a>'
+    return f'<html><body><table>{links}</table><div class="page">{pager}</div></body></html>'
+
+
+# Page shapes that regex parsers tend to get wrong; always part of the equivalence check.
+EDGE_CASE_PAGES = {
+    'detail': [
+        ('label without value', '<div class="int-table">'
+            '<div class="row"><div class="col-th">裁判字號：</div></div>'
+            '<div class="row"><div class="col-th">裁判日期：</div><div class="col-td">D</div></div></div>'),
+        ('unmapped label', '<div class="int-table">'
+            '<div class="row"><div class="col-th">其他：</div><div class="col-td">X</div></div>'
+            '<div class="row"><div class="col-th">裁判字號：</div><div class="col-td">A</div></div></div>'),
+        ('div markup in script', '<div class="int-table"><script>var s = "</div>";</script>'
+            '<div class="row"><div class="col-th">裁判字號：</div><div class="col-td">A<!-- </div> --></div></div></div>'),
+        ('value before label', '<div class="int-table">'
+            '<div class="row"><div class="col-td">B</div><div class="col-th">案由摘要：</div></div></div>'),
+    ],
+    'list': [
+        ('wrapped next link', '<a class="hlTitle_scroll" href="a">a</a><a href="#"><span>下一頁</span></a>'),
+        ('next link with siblings', '<a class="hlTitle_scroll" href="a">a</a><a href="#"><span>下一頁</span> </a>'),
+        ('commented-out next link', '<a class="hlTitle_scroll" href="a">a</a><!-- <a href="#">下一頁</a> -->'),
+        ('next link in script', '<a class="hlTitle_scroll" href="a">a</a><script>p = \'<a href="#">下一頁</a>\';</script>'),
+        ('next link in text', '<a class="hlTitle_scroll" href="a">a</a><a href="#">&gt; 下一頁</a>'),
+    ],
+}
+
+
+def load_cases(corpus_directory, limit):
+    """Returns up to `limit` crawled cases from the split chunk files."""
+    cases = []
+    for path in sorted(glob.glob(os.path.join(corpus_directory, '*.json'))):
+        with open(path, 'r', encoding='utf-8') as f:
+            cases.extend(case for case in json.load(f) if isinstance(case, dict) and 'case_id' in case)
+        if len(cases) >= limit:
+            break
+    return cases[:limit]
+
+
+def synthesize_fixtures(corpus_directory, limit):
+    """Builds detail/list pages from crawled cases when no recorded pages are available."""
+    cases = load_cases(corpus_directory, limit)
+    pages = {
+        'detail': [(case['case_id'], render_detail_page(case)) for case in cases],
+        'list': [],
+    }
+    for start in range(0, len(cases), 20):
+        chunk = [case['case_id'] for case in cases[start:start + 20]]
+        pages['list'].append((f"list {start // 20 + 1}", render_list_page(chunk, start + 20 < len(cases))))
+    return pages
+
+
+def check_equivalence(pages, reference, candidate):
+    """Returns a list of mismatch descriptions between two parsers."""
+    mismatches = []
+    for name, page_html in pages['detail']:
+        expected = reference.parse_case(page_html) or {}
+        actual = candidate.parse_case(page_html) or {}
+        for field in CASE_FIELDS:
+            if expected.get(field) != actual.get(field):
+                mismatches.append(f"{name}: {field} differs: {expected.get(field)!r} != {actual.get(field)!r}")
+    for name, page_html in pages['list']:
+        expected = reference.parse_list(page_html)
+        actual = candidate.parse_list(page_html) or ([], False)
+        if tuple(expected) != tuple(actual):
+            mismatches.append(f"{name}: list page differs: {expected!r} != {actual!r}")
+    return mismatches
+
+
+def benchmark(parser, pages, rounds):
+    """Returns pages/sec for detail and list pages."""
+    results = {}
+    for kind, method in (('detail', parser.parse_case), ('list', parser.parse_list)):
+        if not pages[kind]:
+            continue
+        start = time.perf_counter()
+        for _ in range(rounds):
+            for _, page_html in pages[kind]:
+                method(page_html)
+        elapsed = time.perf_counter() - start
+        results[kind] = len(pages[kind]) * rounds / elapsed
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the case page parsers and check they extract identical fields.")
+    parser.add_argument("--fixtures", default=None, help="Directory with recorded pages in detail/ and list/ (see judicial_crawler.py --record-html).")
+    parser.add_argument("--corpus", default="splitted_jcases", help="Crawled cases used to synthesize pages when --fixtures is not given (default: splitted_jcases).")
+    parser.add_argument("--limit", type=int, default=500, help="Number of synthesized detail pages (default: 500).")
+    parser.add_argument("--rounds", type=int, default=3, help="Passes over the pages per parser (default: 3).")
+    args = parser.parse_args()
+
+    if args.fixtures:
+        pages = load_fixtures(args.fixtures)
+        source = args.fixtures
+    else:
+        pages = synthesize_fixtures(args.corpus, args.limit)
+        source = f"{args.corpus} (synthesized)"
+    print(f"Fixtures: {len(pages['detail'])} detail pages, {len(pages['list'])} list pages from {source}\n")
+
+    mismatches = check_equivalence(EDGE_CASE_PAGES, SoupParser(), FastParser())
+    mismatches += check_equivalence(pages, SoupParser(), FastParser())
+    if mismatches:
+        print(f"❌ {len(mismatches)} mismatches between the soup and fast parsers:")
+        for mismatch in mismatches[:20]:
+            print(f"  - {mismatch}")
+    else:
+        print("✅ Fast parser output is identical to BeautifulSoup for every page.\n")
+
+    baseline = None
+    for name in ('soup', 'fast', 'auto'):
+        results = benchmark(get_parser(name), pages, args.rounds)
+        baseline = baseline or results
+        summary = ', '.join(
+            f"{kind}: {rate:,.0f} pages/sec ({rate / baseline[kind]:.1f}x)" for kind, rate in results.items()
+        )
+        print(f"{name:>5}  {summary}")
+
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
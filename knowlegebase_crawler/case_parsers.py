@@ -0,0 +1,202 @@
+import html
+import re
+
+from bs4 import BeautifulSoup
+
+# Labels of the header rows on a case detail page, mapped to our field names.
+HEADER_MAPPING = {
+    '裁判字號：': 'case_id',
+    '案由摘要：': 'case_summary',
+    '裁判日期：': 'case_date',
+    '裁判要旨：': 'case_gist'
+}
+
+NEXT_PAGE_TEXT = '下一頁'
+
+
+class SoupParser:
+    """Reference parser: builds a full BeautifulSoup tree for every page."""
+
+    name = 'soup'
+
+    def parse_case(self, page_html):
+        """Parses the header fields out of a case detail page."""
+        soup = BeautifulSoup(page_html, 'html.parser')
+
+        data = {}
+
+        # New extraction logic based on the screenshot
+        int_table = soup.find('div', class_='int-table')
+        if int_table:
+            rows = int_table.find_all('div', class_='row')
+            for row in rows:
+                label_div = row.find('div', class_='col-th')
+                value_div = row.find('div', class_='col-td')
+                if label_div and value_div:
+                    label = label_div.text.strip()
+                    value = value_div.text.strip()
+                    if label in HEADER_MAPPING:
+                        data[HEADER_MAPPING[label]] = value
+
+        return data
+
+    def parse_list(self, page_html):
+        """Returns (case hrefs, whether a next-page link exists) for a results page."""
+        soup = BeautifulSoup(page_html, 'html.parser')
+
+        # Correctly select case links based on the provided screenshot
+        case_links = soup.find_all('a', class_='hlTitle_scroll')
+        next_page_link = soup.find('a', string=re.compile(NEXT_PAGE_TEXT))
+        return [link['href'] for link in case_links], next_page_link is not None
+
+
+def _class_pattern(class_name):
+    return re.compile(
+        r'<div\b[^>]*?\bclass\s*=\s*(["\'])(?:(?!\1).)*?(?<![\w-])' + re.escape(class_name) + r'(?![\w-])',
+        re.IGNORECASE | re.DOTALL,
+    )
+
+
+_INT_TABLE_RE = _class_pattern('int-table')
+_ROW_RE = _class_pattern('row')
+_COL_TH_RE = _class_pattern('col-th')
+_COL_TD_RE = _class_pattern('col-td')
+# Markup BeautifulSoup never turns into tags: comments and script/style bodies.
+_HIDDEN_RE = re.compile(r'<!--.*?-->|<(script|style)\b[^>]*>.*?</\1\s*>', re.IGNORECASE | re.DOTALL)
+_DIV_TAG_RE = re.compile(r'<(/?)div\b[^>]*>', re.IGNORECASE)
+# Splits markup into the text nodes between tags, dropping comments and script/style bodies.
+_NODE_SPLIT_RE = re.compile(
+    r'<!--.*?-->|<(?:script|style)\b[^>]*>.*?</(?:script|style)\s*>|<[^>]*>',
+    re.IGNORECASE | re.DOTALL,
+)
+_ASCII_SPACES = '\x20\x0a\x09\x0c\x0d'
+_LINK_RE = re.compile(
+    r'<a\b([^>]*?\bclass\s*=\s*(["\'])(?:(?!\2).)*?(?<![\w-])hlTitle_scroll(?![\w-])[^>]*)>',
+    re.IGNORECASE | re.DOTALL,
+)
+_HREF_RE = re.compile(r'\bhref\s*=\s*(?:"([^"]*)"|\'([^\']*)\'|([^\s>]+))', re.IGNORECASE)
+_ANCHOR_RE = re.compile(r'<a\b[^>]*>(.*?)</a\s*>', re.IGNORECASE | re.DOTALL)
+_SINGLE_CHILD_RE = re.compile(r'<([A-Za-z][\w-]*)\b[^>]*>(.*)</\1\s*>', re.DOTALL)
+
+
+def _div_inner(page_html, match):
+    """Returns the inner HTML of the <div> opened by `match`, honouring nested divs."""
+    start = page_html.index('>', match.end()) + 1
+    depth = 1
+    for tag in _DIV_TAG_RE.finditer(page_html, start):
+        depth += -1 if tag.group(1) else 1
+        if depth == 0:
+            return page_html[start:tag.start()], tag.end()
+    return page_html[start:], len(page_html)
+
+
+def _single_string(fragment):
+    """
+    Mirrors BeautifulSoup's `.string`: the text of an element whose only child
+    is a string, or a single element wrapping one. Returns None otherwise.
+    """
+    while fragment.startswith('<'):
+        wrapper = _SINGLE_CHILD_RE.fullmatch(fragment)
+        if not wrapper:
+            return None
+        fragment = wrapper.group(2)
+    if '<' in fragment or not fragment:
+        return None
+    return html.unescape(fragment)
+
+
+def _text(fragment):
+    """Mirrors BeautifulSoup's `.text.strip()`, including how it collapses whitespace-only strings."""
+    pieces = []
+    for piece in _NODE_SPLIT_RE.split(fragment):
+        if not piece:
+            continue
+        piece = html.unescape(piece)
+        if not piece.strip(_ASCII_SPACES):
+            piece = '\n' if '\n' in piece else ' '
+        pieces.append(piece)
+    return ''.join(pieces).strip()
+
+
+class FastParser:
+    """
+    Targeted parser for the detail and list page shapes.
+
+    Rather than building a tree, it jumps straight to the `int-table` block,
+    the `hlTitle_scroll` links and the next-page link with precompiled regular
+    expressions. It returns None when a page doesn't look like what it expects,
+    so callers can fall back to SoupParser.
+    """
+
+    name = 'fast'
+
+    def parse_case(self, page_html):
+        page_html = _HIDDEN_RE.sub('', page_html)
+        table = _INT_TABLE_RE.search(page_html)
+        if not table:
+            return None
+        table_html, _ = _div_inner(page_html, table)
+
+        data = {}
+        # Like SoupParser, pair the first col-th and col-td inside each row div.
+        for row_match in _ROW_RE.finditer(table_html):
+            row_html, _ = _div_inner(table_html, row_match)
+            label_match = _COL_TH_RE.search(row_html)
+            value_match = _COL_TD_RE.search(row_html)
+            if not label_match or not value_match:
+                continue
+            label = _text(_div_inner(row_html, label_match)[0])
+            if label in HEADER_MAPPING:
+                data[HEADER_MAPPING[label]] = _text(_div_inner(row_html, value_match)[0])
+        return data or None
+
+    def parse_list(self, page_html):
+        page_html = _HIDDEN_RE.sub('', page_html)
+        hrefs = []
+        for link in _LINK_RE.finditer(page_html):
+            href = _HREF_RE.search(link.group(1))
+            if href:
+                hrefs.append(html.unescape(next(group for group in href.groups() if group is not None)))
+        if not hrefs:
+            return None
+        has_next = any(
+            NEXT_PAGE_TEXT in (_single_string(inner) or '') for inner in _ANCHOR_RE.findall(page_html)
+        )
+        return hrefs, has_next
+
+
+class FallbackParser:
+    """Tries each parser in turn and returns the first usable result."""
+
+    def __init__(self, *parsers):
+        self.parsers = parsers
+        self.name = '+'.join(parser.name for parser in parsers)
+
+    def parse_case(self, page_html):
+        for parser in self.parsers:
+            data = parser.parse_case(page_html)
+            if data:
+                return data
+        return {}
+
+    def parse_list(self, page_html):
+        for parser in self.parsers:
+            result = parser.parse_list(page_html)
+            if result and result[0]:
+                return result
+        return [], False
+
+
+PARSERS = {
+    'auto': lambda: FallbackParser(FastParser(), SoupParser()),
+    'fast': lambda: FallbackParser(FastParser()),
+    'soup': SoupParser,
+}
+
+
+def get_parser(name='auto'):
+    """Returns a parser by name: 'auto' (fast with BeautifulSoup fallback), 'fast' or 'soup'."""
+    try:
+        return PARSERS[name]()
+    except KeyError:
+        raise ValueError(f"Unknown parser '{name}', expected one of: {', '.join(PARSERS)}")
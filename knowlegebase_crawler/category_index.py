@@ -0,0 +1,259 @@
+import argparse
+import json
+import os
+import re
+import threading
+import time
+
+DEFAULT_SOURCE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'jcase_merged.json')
+
+_CHINESE_DIGITS = {'〇': 0, '零': 0, '一': 1, '二': 2, '兩': 2, '三': 3, '四': 4, '五': 5, '六': 6, '七': 7, '八': 8, '九': 9}
+_CHINESE_UNITS = {'十': 10, '百': 100, '千': 1000}
+NUMERAL_CHARS = '0-9〇零一二兩三四五六七八九十百千'
+_STATUTE_RE = re.compile(rf'^(\S+?(?:法|條例|規則|通則))第\s*([{NUMERAL_CHARS}]+)\s*條(?:之\s*([{NUMERAL_CHARS}]+))?')
+
+
+def chinese_numeral_to_int(numeral):
+    """Converts '1030', '九十五' or '一千零三十' to an int."""
+    if numeral.isdigit():
+        return int(numeral)
+    total, digit = 0, None
+    for char in numeral:
+        if char in _CHINESE_UNITS:
+            total += (1 if digit is None else digit) * _CHINESE_UNITS[char]
+            digit = None
+        else:
+            digit = _CHINESE_DIGITS.get(char, 0)
+    return total + (digit or 0)
+
+
+def normalize_statute(text):
+    """
+    Returns the article a tag cites, e.g. '民法第184條第1項後段' -> '民法第184條',
+    '土地法第34條之一' -> '土地法第34條之1', or None if the tag is not a statute.
+    """
+    match = _STATUTE_RE.match(text.strip())
+    if not match:
+        return None
+    law, article, sub_article = match.groups()
+    return format_statute(law, article, sub_article)
+
+
+def format_statute(law, article, sub_article=None):
+    """Canonical form of a citation: Arabic numerals, no spaces, e.g. '民法第1030條之3'."""
+    statute = f"{law}第{chinese_numeral_to_int(article)}條"
+    if sub_article:
+        statute += f"之{chinese_numeral_to_int(sub_article)}"
+    return statute
+
+
+def _iter_bits(bitmap):
+    """Yields the positions of the set bits of an int, lowest first."""
+    bits = bin(bitmap)[:1:-1]
+    position = bits.find('1')
+    while position != -1:
+        yield position
+        position = bits.find('1', position + 1)
+
+
+class CategoryIndex:
+    """
+    In-memory inverted index over the category knowledge base (jcase_merged.json).
+
+    Every case_id gets a small integer id, and each category, subcategory, tag
+    and cited statute keeps its postings as a bitmap (a Python int with one bit
+    per case). Multi-filter queries are then a handful of `&` / `|` operations
+    on ~1 KB integers, well under a millisecond for the whole corpus.
+
+    Integer ids are stable for the life of the index, so `refresh()` can swap in
+    a rebuilt index when the JSON file changes without invalidating ids that
+    callers already hold.
+    """
+
+    def __init__(self, source=DEFAULT_SOURCE, check_interval=5.0):
+        self.source = source
+        self.check_interval = check_interval
+        self.case_ids = []          # int id -> case_id
+        self.case_numbers = {}      # case_id -> int id
+        self._lock = threading.Lock()
+        self._reload_lock = threading.Lock()    # one check/_load() at a time; _case_number isn't thread-safe
+        self._signature = None
+        self._checked_at = 0.0
+        self._load()
+
+    def _case_number(self, case_id):
+        number = self.case_numbers.get(case_id)
+        if number is None:
+            number = self.case_numbers[case_id] = len(self.case_ids)
+            self.case_ids.append(case_id)
+        return number
+
+    def _file_signature(self):
+        stat = os.stat(self.source)
+        return stat.st_mtime_ns, stat.st_size
+
+    def _load(self):
+        signature = self._file_signature()
+        with open(self.source, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+
+        categories, subcategories, tags, statutes = {}, {}, {}, {}
+        all_cases = 0
+        taxonomy, case_tags, case_subcategories = [], {}, {}
+        for category in data:
+            cat_id = category.get('category_id')
+            if cat_id is None:
+                continue
+            taxonomy.append({
+                'category_id': cat_id,
+                'category_name': category.get('category_name'),
+                'subcategories': [
+                    {'subcategory_id': sub.get('subcategory_id'), 'subcategory_name': sub.get('subcategory_name')}
+                    for sub in category.get('subcategories') or []
+                ],
+            })
+            for subcategory in category.get('subcategories') or []:
+                sub_id = subcategory.get('subcategory_id')
+                for entry in subcategory.get('related_case_id') or []:
+                    for case_id, case_tag_list in entry.items():
+                        bit = 1 << self._case_number(case_id)
+                        all_cases |= bit
+                        categories[cat_id] = categories.get(cat_id, 0) | bit
+                        subcategories[sub_id] = subcategories.get(sub_id, 0) | bit
+                        case_subcategories.setdefault(case_id, []).append(sub_id)
+                        known = case_tags.setdefault(case_id, [])
+                        for tag in case_tag_list or []:
+                            tags[tag] = tags.get(tag, 0) | bit
+                            statute = normalize_statute(tag)
+                            if statute:
+                                statutes[statute] = statutes.get(statute, 0) | bit
+                            if tag not in known:
+                                known.append(tag)
+
+        with self._lock:
+            self.categories = categories
+            self.subcategories = subcategories
+            self.tags = tags
+            self.statutes = statutes
+            self.taxonomy = taxonomy
+            self.case_tags = case_tags
+            self.case_subcategories = case_subcategories
+            self.all_cases = all_cases
+            self._signature = signature
+            self._checked_at = time.monotonic()
+
+    def refresh(self, force=False):
+        """
+        Rebuilds the index if the source file changed since it was loaded.
+
+        The stat() is rate-limited to once per `check_interval` seconds, so this
+        is cheap enough to call at the start of every query. Returns True if
+        the index was reloaded.
+        """
+        if not force and time.monotonic() - self._checked_at < self.check_interval:
+            return False
+        with self._reload_lock:
+            # Another query may have checked or reloaded while we waited for the lock.
+            now = time.monotonic()
+            if not force and now - self._checked_at < self.check_interval:
+                return False
+            self._checked_at = now
+            if not force and self._file_signature() == self._signature:
+                return False
+            self._load()
+            return True
+
+    @staticmethod
+    def _postings(postings, keys):
+        return [postings.get(key, 0) for key in keys]
+
+    def match(self, category_ids=None, subcategory_ids=None, tags=None, statutes=None, match_all_tags=True):
+        """
+        Returns the bitmap of cases matching every given filter.
+
+        Categories and subcategories are OR-ed within their filter (a case may
+        sit in any of them). Tags and statutes are AND-ed by default, or OR-ed
+        with match_all_tags=False. Filters that are None are ignored.
+        """
+        with self._lock:
+            result = self.all_cases
+            if category_ids:
+                result &= self._union(self._postings(self.categories, category_ids))
+            if subcategory_ids:
+                result &= self._union(self._postings(self.subcategories, subcategory_ids))
+            term_bitmaps = []
+            if tags:
+                term_bitmaps += self._postings(self.tags, tags)
+            if statutes:
+                term_bitmaps += self._postings(self.statutes, [normalize_statute(s) or s for s in statutes])
+            if term_bitmaps:
+                if match_all_tags:
+                    for bitmap in term_bitmaps:
+                        result &= bitmap
+                else:
+                    result &= self._union(term_bitmaps)
+            return result
+
+    @staticmethod
+    def _union(bitmaps):
+        result = 0
+        for bitmap in bitmaps:
+            result |= bitmap
+        return result
+
+    def search(self, limit=None, **filters):
+        """Returns [{'case_id', 'tags', 'subcategory_ids'}] for the cases matching `filters` (see match())."""
+        self.refresh()
+        results = []
+        for number in _iter_bits(self.match(**filters)):
+            case_id = self.case_ids[number]
+            results.append({
+                'case_id': case_id,
+                'tags': self.case_tags.get(case_id, []),
+                'subcategory_ids': self.case_subcategories.get(case_id, []),
+            })
+            if limit is not None and len(results) >= limit:
+                break
+        return results
+
+    def count(self, **filters):
+        self.refresh()
+        return self.match(**filters).bit_count()
+
+    def stats(self):
+        return {
+            'cases': len(self.case_tags),
+            'categories': len(self.categories),
+            'subcategories': len(self.subcategories),
+            'tags': len(self.tags),
+            'statutes': len(self.statutes),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query the category/tag/statute index of the knowledge base.")
+    parser.add_argument("--source", default=DEFAULT_SOURCE, help="Category dataset to index (default: jcase_merged.json).")
+    parser.add_argument("--category", type=int, action='append', help="Category id (repeatable).")
+    parser.add_argument("--subcategory", action='append', help="Subcategory id such as 1-1 (repeatable).")
+    parser.add_argument("--tag", action='append', help="Tag such as 意思表示 (repeatable).")
+    parser.add_argument("--statute", action='append', help="Statute such as 民法第92條 (repeatable).")
+    parser.add_argument("--any", action='store_true', help="Match any of the tags/statutes instead of all of them.")
+    parser.add_argument("--limit", type=int, default=20, help="Maximum results to print (default: 20).")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    index = CategoryIndex(args.source)
+    print(f"Built index in {(time.perf_counter() - started) * 1000:.0f} ms: {index.stats()}")
+
+    filters = dict(category_ids=args.category, subcategory_ids=args.subcategory, tags=args.tag,
+                   statutes=args.statute, match_all_tags=not args.any)
+    started = time.perf_counter()
+    results = index.search(limit=args.limit, **filters)
+    elapsed = (time.perf_counter() - started) * 1000
+    print(f"{index.count(**filters)} matching cases ({elapsed:.3f} ms)")
+    for result in results:
+        print(f"  - {result['case_id']}  {result['subcategory_ids']}  {', '.join(result['tags'])}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+import argparse
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+
+from bench_parsers import CASE_FIELDS, load_cases, render_detail_page, render_list_page
+from crawl_store import CrawlStore
+from judicial_crawler import crawl_judicial_website, create_session
+
+CASES_PER_PAGE = 20
+
+
+class StandInSite:
+    """
+    Serves list and detail pages rendered from crawled cases, like the judicial
+    website does, and logs every request with the time it arrived.
+
+    `faults` maps a decoded request path (including the query) to a list of actions
+    applied to its first requests, one per request: an int is returned as that
+    HTTP status, a float sleeps that many seconds before answering.
+    """
+
+    def __init__(self, cases, faults=None):
+        self.cases = {case['case_id']: case for case in cases}
+        self.case_ids = list(self.cases)
+        self.faults = {path: list(actions) for path, actions in (faults or {}).items()}
+        self.requests = []          # (arrival time, path)
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self.server.daemon_threads = True
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def list_path(self, page):
+        return f"/list.aspx?q=1&page={page}"
+
+    def detail_path(self, case_id):
+        return f"/data.aspx?ty=JD&id={case_id}"
+
+    def page_count(self):
+        return (len(self.case_ids) + CASES_PER_PAGE - 1) // CASES_PER_PAGE
+
+    def render(self, path):
+        url = urlparse(path)
+        query = parse_qs(url.query)
+        if url.path == '/list.aspx':
+            page = int(query.get('page', ['1'])[0])
+            chunk = self.case_ids[(page - 1) * CASES_PER_PAGE:page * CASES_PER_PAGE]
+            return render_list_page(chunk, page < self.page_count())
+        if url.path == '/data.aspx':
+            case = self.cases.get(query.get('id', [''])[0])
+            if case is not None:
+                return render_detail_page(case)
+        return None
+
+    def _handler(self):
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                path = unquote(self.path)
+                with site.lock:
+                    site.requests.append((time.monotonic(), path))
+                    actions = site.faults.get(path)
+                    action = actions.pop(0) if actions else None
+                if isinstance(action, float):
+                    time.sleep(action)
+                elif isinstance(action, int):
+                    self.send_error(action)
+                    return
+                page_html = site.render(self.path)
+                if page_html is None:
+                    self.send_error(404)
+                    return
+                body = page_html.encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                try:
+                    self.wfile.write(body)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # The client gave up after its timeout.
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def request_times(self, path):
+        return [at for at, requested in self.requests if requested == path]
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def check_retries(site, path, failures, backoff):
+    """Checks that a path failing `failures` times was retried with exponentially growing delays."""
+    times = site.request_times(path)
+    if len(times) != failures + 1:
+        return [f"{path}: expected {failures + 1} requests, got {len(times)}"]
+    mismatches = []
+    for attempt, (previous, current) in enumerate(zip(times, times[1:])):
+        expected = backoff * (2 ** attempt)
+        if current - previous < expected:
+            mismatches.append(f"{path}: retry {attempt + 1} after {current - previous:.2f}s, expected >= {expected:.2f}s")
+    return mismatches
+
+
+def check_rate(site, rate, burst, slack=0.05):
+    """Checks that no window of requests exceeded the token bucket's `burst + rate * window`."""
+    times = sorted(at for at, _ in site.requests)
+    for first in range(len(times)):
+        for last in range(first + burst, len(times)):
+            window = times[last] - times[first]
+            allowed = burst + rate * (window + slack)
+            if last - first + 1 > allowed:
+                return [f"{last - first + 1} requests within {window:.2f}s, token bucket allows {allowed:.1f}"]
+    return []
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Crawl a local stand-in of the judicial website with injected 503s and timeouts, and check the results.")
+    parser.add_argument("--corpus", default="splitted_jcases", help="Crawled cases the stand-in pages are rendered from (default: splitted_jcases).")
+    parser.add_argument("--limit", type=int, default=50, help="Number of cases served (default: 50).")
+    parser.add_argument("--workers", type=int, default=4, help="Concurrent case page fetches (default: 4).")
+    parser.add_argument("--rate", type=float, default=20.0, help="Requests per second per host (default: 20).")
+    parser.add_argument("--burst", type=int, default=4, help="Token bucket size (default: 4).")
+    parser.add_argument("--backoff", type=float, default=0.1, help="Initial retry backoff in seconds (default: 0.1).")
+    parser.add_argument("--timeout", type=float, default=0.5, help="Request timeout in seconds (default: 0.5).")
+    args = parser.parse_args()
+
+    cases = load_cases(args.corpus, args.limit)
+    retries = 3
+    with StandInSite(cases) as site:
+        # Every seventh case and the first list page fail with 503 at first, one
+        # case times out once, and one case fails more often than we retry.
+        flaky = {site.detail_path(case_id): [503] * (1 + index % 2) for index, case_id in enumerate(site.case_ids[::7])}
+        flaky[site.list_path(1)] = [503]
+        slow = site.detail_path(site.case_ids[1])
+        broken = site.detail_path(site.case_ids[2])
+        site.faults = {path: list(actions) for path, actions in flaky.items()}
+        site.faults[slow] = [args.timeout * 4]
+        site.faults[broken] = [503] * (retries + 1)
+
+        started = time.perf_counter()
+        with tempfile.TemporaryDirectory() as directory:
+            with CrawlStore(directory) as store:
+                session = create_session(pool_size=args.workers)
+                crawl_judicial_website(f"{site.base_url}/list.aspx?q=1", store=store, max_workers=args.workers,
+                                       rate=args.rate, burst=args.burst, retries=retries, backoff=args.backoff,
+                                       session=session, timeout=args.timeout)
+                session.close()
+                stored = {case['case_id']: case for case in store.iter_cases()}
+        elapsed = time.perf_counter() - started
+
+    print(f"\nCrawled {len(stored)} of {len(cases)} cases from the stand-in in {elapsed:.2f}s "
+          f"({len(site.requests)} requests)\n")
+
+    mismatches = []
+    broken_id = site.case_ids[2]
+    if broken_id in stored:
+        mismatches.append(f"{broken_id}: stored although every attempt failed")
+    for case in cases:
+        if case['case_id'] == broken_id:
+            continue
+        if case['case_id'] not in stored:
+            mismatches.append(f"{case['case_id']}: missing from the store")
+            continue
+        for field in CASE_FIELDS:
+            if case.get(field) != stored[case['case_id']].get(field):
+                mismatches.append(f"{case['case_id']}: {field} differs")
+    for path, actions in flaky.items():
+        mismatches += check_retries(site, path, len(actions), args.backoff)
+    mismatches += check_retries(site, broken, retries, args.backoff)
+    slow_requests = site.request_times(slow)
+    if len(slow_requests) != 2 or slow_requests[1] - slow_requests[0] < args.timeout:
+        mismatches.append(f"{slow}: expected one timeout and one retry, got {len(slow_requests)} requests")
+    mismatches += check_rate(site, args.rate, args.burst)
+
+    if mismatches:
+        print(f"❌ {len(mismatches)} problems:")
+        for mismatch in mismatches[:20]:
+            print(f"  - {mismatch}")
+    else:
+        print("✅ Every case was stored, 503s and timeouts were retried with backoff, and the rate limit held.")
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
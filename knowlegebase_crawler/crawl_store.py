@@ -0,0 +1,241 @@
+import argparse
+import json
+import os
+import sys
+
+CASES_FILENAME = 'cases.jsonl'
+INDEX_FILENAME = 'case_index.jsonl'
+CHECKPOINTS_FILENAME = 'checkpoints.jsonl'
+
+# Key under which each cases.jsonl line keeps the URL it was fetched from, so
+# the index can be rebuilt with URLs. It is stripped again when reading cases.
+URL_KEY = '_url'
+
+
+def _fsync(f):
+    f.flush()
+    os.fsync(f.fileno())
+
+
+def _read_jsonl(path):
+    """Yields every complete JSON line of a file, ignoring a torn trailing line."""
+    if not os.path.exists(path):
+        return
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if not line.endswith('\n'):
+                break
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                break
+
+
+def _iter_stored_cases(path):
+    """Yields the cases of a cases.jsonl file without their stored URL."""
+    for case in _read_jsonl(path):
+        case.pop(URL_KEY, None)
+        yield case
+
+
+class CrawlStore:
+    """
+    Append-only, resumable storage for crawled cases.
+
+    The store is a directory of three JSON Lines files:
+      - cases.jsonl:       one crawled case per line, in crawl order, with its
+                           source URL under URL_KEY
+      - case_index.jsonl:  {"case_id", "url"} for every fetched case URL,
+                           including duplicates of an already stored case
+      - checkpoints.jsonl: one line per finished results page, per start URL
+
+    Each page is written as cases -> index -> checkpoint, each fsync'd, so a
+    checkpoint is only ever recorded for data that is on disk. Cases written
+    after the last checkpoint are re-indexed (URL included) when the store is
+    reopened, and a torn trailing line from a crash is truncated away. If the
+    index file is lost it is rebuilt the same way from cases.jsonl.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.cases_path = os.path.join(directory, CASES_FILENAME)
+        self.index_path = os.path.join(directory, INDEX_FILENAME)
+        self.checkpoints_path = os.path.join(directory, CHECKPOINTS_FILENAME)
+
+        self.case_ids = set()
+        self.urls = set()
+        index_missing = not os.path.exists(self.index_path)
+        for entry in _read_jsonl(self.index_path):
+            self._remember(entry.get('case_id'), entry.get('url'))
+
+        self.checkpoints = {}
+        last_offset = 0
+        for checkpoint in _read_jsonl(self.checkpoints_path):
+            self.checkpoints[checkpoint['base_url']] = checkpoint
+            last_offset = max(last_offset, checkpoint.get('offset', 0))
+
+        if index_missing:
+            # Rebuild the whole index from the cases file.
+            last_offset = 0
+
+        self._truncate_torn_line(self.index_path)
+        self._truncate_torn_line(self.checkpoints_path)
+        self.index_file = open(self.index_path, 'a', encoding='utf-8')
+        self.checkpoints_file = open(self.checkpoints_path, 'a', encoding='utf-8')
+        self._recover(last_offset)
+        self.cases_file = open(self.cases_path, 'a', encoding='utf-8')
+
+    def _remember(self, case_id, url):
+        if case_id:
+            self.case_ids.add(case_id)
+        if url:
+            self.urls.add(url)
+
+    @staticmethod
+    def _truncate_torn_line(path):
+        if not os.path.exists(path):
+            return
+        with open(path, 'rb+') as f:
+            data = f.read()
+            if data and not data.endswith(b'\n'):
+                f.truncate(data.rfind(b'\n') + 1)
+
+    def _recover(self, offset):
+        """Indexes cases appended after the last checkpoint and drops a torn final line."""
+        if not os.path.exists(self.cases_path):
+            return
+        recovered = 0
+        with open(self.cases_path, 'rb+') as f:
+            f.seek(offset)
+            good_end = offset
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break
+                try:
+                    case = json.loads(line)
+                except json.JSONDecodeError:
+                    break
+                good_end += len(line)
+                case_id = case.get('case_id')
+                url = case.get(URL_KEY)
+                if (case_id and case_id not in self.case_ids) or (url and url not in self.urls):
+                    self.index_file.write(json.dumps({'case_id': case_id, 'url': url}, ensure_ascii=False) + '\n')
+                    self._remember(case_id, url)
+                    recovered += 1
+            f.truncate(good_end)
+        if recovered:
+            _fsync(self.index_file)
+            print(f"Re-indexed {recovered} stored cases missing from {INDEX_FILENAME}.")
+
+    def has_url(self, url):
+        return url in self.urls
+
+    def has_case(self, case_id):
+        return case_id in self.case_ids
+
+    def resume_page(self, base_url):
+        """Returns the page to continue from, or None if this start URL has no unfinished crawl."""
+        checkpoint = self.checkpoints.get(base_url)
+        if checkpoint is None or checkpoint.get('done'):
+            return None
+        return checkpoint['page'] + 1
+
+    def append_page(self, base_url, page, cases, done=False):
+        """
+        Appends one results page worth of (url, case) pairs and checkpoints it.
+
+        Cases whose case_id is already stored are dropped, but their URL is
+        still indexed so it is not fetched again after a restart. Returns the
+        number of cases actually written.
+        """
+        written = 0
+        index_entries = []
+        for url, case in cases:
+            case_id = case.get('case_id')
+            if case_id and case_id in self.case_ids:
+                if url and url not in self.urls:
+                    index_entries.append({'case_id': case_id, 'url': url})
+                    self._remember(None, url)
+                continue
+            self.cases_file.write(json.dumps(dict(case, **{URL_KEY: url}), ensure_ascii=False) + '\n')
+            index_entries.append({'case_id': case_id, 'url': url})
+            self._remember(case_id, url)
+            written += 1
+        _fsync(self.cases_file)
+
+        for entry in index_entries:
+            self.index_file.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        _fsync(self.index_file)
+
+        checkpoint = {
+            'base_url': base_url,
+            'page': page,
+            'done': done,
+            'offset': self.cases_file.tell(),
+        }
+        self.checkpoints_file.write(json.dumps(checkpoint, ensure_ascii=False) + '\n')
+        _fsync(self.checkpoints_file)
+        self.checkpoints[base_url] = checkpoint
+        return written
+
+    def mark_done(self, base_url):
+        """Records that the crawl for a start URL reached its last page."""
+        checkpoint = dict(self.checkpoints.get(base_url, {'base_url': base_url, 'page': 0}))
+        checkpoint['done'] = True
+        checkpoint['offset'] = self.cases_file.tell()
+        self.checkpoints_file.write(json.dumps(checkpoint, ensure_ascii=False) + '\n')
+        _fsync(self.checkpoints_file)
+        self.checkpoints[base_url] = checkpoint
+
+    def iter_cases(self):
+        self.cases_file.flush()
+        yield from _iter_stored_cases(self.cases_path)
+
+    def close(self):
+        for f in (self.cases_file, self.index_file, self.checkpoints_file):
+            f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def export_json(store_directory, output_filename):
+    """
+    Streams the store into the legacy `judicial_cases.json` format
+    (a single JSON list, indent=4) without loading it into memory.
+
+    The store is only read, never repaired, so this is safe to run while a
+    crawl is still appending to it; a line that is still being written is
+    simply left out.
+    """
+    count = 0
+    with open(output_filename, 'w', encoding='utf-8') as f_out:
+        f_out.write('[')
+        for case in _iter_stored_cases(os.path.join(store_directory, CASES_FILENAME)):
+            f_out.write(',\n    ' if count else '\n    ')
+            f_out.write(json.dumps(case, ensure_ascii=False, indent=4).replace('\n', '\n    '))
+            count += 1
+        f_out.write('\n]' if count else ']')
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export a crawl store to the JSON list format used by the other scripts.")
+    parser.add_argument("--store", default="judicial_cases_store", help="Crawl store directory (default: judicial_cases_store).")
+    parser.add_argument("--output_file", default="judicial_cases.json", help="Exported JSON file (default: judicial_cases.json).")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.store):
+        print(f"Error: Crawl store not found at '{args.store}'.", file=sys.stderr)
+        sys.exit(1)
+
+    count = export_json(args.store, args.output_file)
+    print(f"Exported {count} cases to {args.output_file}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,372 @@
+import argparse
+import hashlib
+import json
+import os
+import random
+import shutil
+import struct
+import sys
+import tempfile
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+DEFAULT_MODEL = 'text-embedding-ada-002'
+DEFAULT_MAX_ENTRIES = 10000
+DEFAULT_BATCH_WINDOW = 0.01     # seconds a miss waits for others to share its embeddings request
+DEFAULT_MAX_BATCH = 64
+
+VECTORS_FILENAME = 'vectors.bin'
+INDEX_FILENAME = 'index.jsonl'
+
+# struct codes for the stored vector formats; float16 halves the size of float32
+# and is well within the precision cosine similarity needs.
+DTYPES = {'float16': 'e', 'float32': 'f'}
+
+
+def normalize_query(text):
+    """Cache key for a query: NFKC-normalized (full-width -> half-width) with whitespace collapsed."""
+    return ' '.join(unicodedata.normalize('NFKC', text).split())
+
+
+class _Pending:
+    """One text waiting for its embedding; every caller asking for the same text waits on it."""
+
+    def __init__(self, text):
+        self.text = text
+        self.done = threading.Event()
+        self.vector = None
+        self.error = None
+
+
+class EmbeddingCache:
+    """
+    Two-tier cache in front of an embeddings API.
+
+    `embed` is called with a list of texts and must return one vector per text
+    (e.g. a wrapper around `client.embeddings.create(model=..., input=texts)`).
+    Lookups go memory LRU -> disk store -> `embed`:
+
+      - the LRU holds up to `max_entries` vectors as packed float16/float32 bytes;
+      - with a `directory`, every computed vector is appended to vectors.bin and
+        indexed in index.jsonl under (model, normalized text), so it survives
+        restarts and is shared by every process using the directory;
+      - concurrent requests for the same text share one in-flight call, and misses
+        arriving within `batch_window` seconds are sent as one `embed` call of at
+        most `max_batch` texts.
+
+    Vectors are returned as lists of floats, rounded to `dtype` even on the first
+    call so a cached answer is identical to a fresh one.
+    """
+
+    def __init__(self, embed, model=DEFAULT_MODEL, directory=None, max_entries=DEFAULT_MAX_ENTRIES,
+                 dtype='float16', batch_window=DEFAULT_BATCH_WINDOW, max_batch=DEFAULT_MAX_BATCH):
+        if dtype not in DTYPES:
+            raise ValueError(f"Unknown dtype '{dtype}', expected one of: {', '.join(DTYPES)}")
+        self.embed = embed
+        self.model = model
+        self.directory = directory
+        self.max_entries = max_entries
+        self.dtype = dtype
+        self.batch_window = batch_window
+        self.max_batch = max(1, max_batch)
+
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()    # text -> packed vector, least recently used first
+        self._inflight = {}             # text -> _Pending
+        self._queue = []                # _Pending not yet sent to embed
+        self._collecting = False        # a caller is waiting out the batch window
+        self._batch_full = threading.Event()
+        self._counts = dict.fromkeys(
+            ('requests', 'memory_hits', 'disk_hits', 'shared', 'misses', 'embed_calls', 'errors'), 0)
+        self._embed_seconds = 0.0
+
+        self._disk = {}                 # text -> (offset, dtype, dim)
+        self._disk_lock = threading.Lock()
+        self._vectors_file = None
+        if directory:
+            self._open_disk()
+
+    def _open_disk(self):
+        os.makedirs(self.directory, exist_ok=True)
+        vectors_path = os.path.join(self.directory, VECTORS_FILENAME)
+        index_path = os.path.join(self.directory, INDEX_FILENAME)
+        self._vectors_file = open(vectors_path, 'ab+')
+        size = os.path.getsize(vectors_path)
+        if os.path.exists(index_path):
+            with open(index_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    if not line.endswith('\n'):
+                        break # Torn by a crash; the vector it pointed at is simply unused
+                    entry = json.loads(line)
+                    length = entry['dim'] * struct.calcsize(DTYPES[entry['dtype']])
+                    if entry['model'] == self.model and entry['offset'] + length <= size:
+                        self._disk[entry['text']] = (entry['offset'], entry['dtype'], entry['dim'])
+        self._index_file = open(index_path, 'a', encoding='utf-8')
+
+    @staticmethod
+    def _pack(vector, dtype):
+        return struct.pack(f'<{len(vector)}{DTYPES[dtype]}', *vector)
+
+    @staticmethod
+    def _unpack(data, dtype):
+        return list(struct.unpack(f'<{len(data) // struct.calcsize(DTYPES[dtype])}{DTYPES[dtype]}', data))
+
+    def _read_disk(self, text):
+        offset, dtype, dim = self._disk[text]
+        with self._disk_lock:
+            self._vectors_file.seek(offset)
+            data = self._vectors_file.read(dim * struct.calcsize(DTYPES[dtype]))
+        return data if dtype == self.dtype else self._pack(self._unpack(data, dtype), self.dtype)
+
+    def _write_disk(self, entries):
+        """Appends (text, packed vector) pairs: vectors first, then their index lines."""
+        lines = []
+        with self._disk_lock:
+            self._vectors_file.seek(0, os.SEEK_END)
+            for text, packed in entries:
+                offset = self._vectors_file.tell()
+                self._vectors_file.write(packed)
+                dim = len(packed) // struct.calcsize(DTYPES[self.dtype])
+                self._disk[text] = (offset, self.dtype, dim)
+                lines.append(json.dumps({'model': self.model, 'text': text, 'dtype': self.dtype,
+                                         'offset': offset, 'dim': dim}, ensure_ascii=False) + '\n')
+            self._vectors_file.flush()
+            self._index_file.write(''.join(lines))
+            self._index_file.flush()
+
+    def _remember(self, text, packed):
+        self._memory[text] = packed
+        self._memory.move_to_end(text)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, text):
+        """Returns the embedding of one query."""
+        return self.get_many([text])[0]
+
+    def get_many(self, texts):
+        """Returns the embeddings of several queries, sending the uncached ones in one batch."""
+        keys = [normalize_query(text) for text in texts]
+        found = {}
+        waiting = {}
+        leader = False
+        with self._lock:
+            for key in keys:
+                self._counts['requests'] += 1
+                if key in found or key in waiting:
+                    self._counts['shared'] += 1
+                elif key in self._memory:
+                    self._memory.move_to_end(key)
+                    found[key] = self._memory[key]
+                    self._counts['memory_hits'] += 1
+                elif key in self._disk:
+                    found[key] = None   # read below, outside the lock
+                    self._counts['disk_hits'] += 1
+                elif key in self._inflight:
+                    waiting[key] = self._inflight[key]
+                    self._counts['shared'] += 1
+                else:
+                    pending = waiting[key] = self._inflight[key] = _Pending(key)
+                    self._queue.append(pending)
+                    self._counts['misses'] += 1
+                    if len(self._queue) >= self.max_batch:
+                        self._batch_full.set()
+                    if not self._collecting:
+                        self._collecting = leader = True
+
+        for key, packed in found.items():
+            if packed is None:
+                found[key] = self._read_disk(key)
+                with self._lock:
+                    self._remember(key, found[key])
+
+        if leader:
+            self._batch_full.wait(self.batch_window)
+            self._run_batches()
+        for key, pending in waiting.items():
+            pending.done.wait()
+            if pending.error is not None:
+                raise pending.error
+            found[key] = pending.vector
+        return [self._unpack(found[key], self.dtype) for key in keys]
+
+    def _run_batches(self):
+        while True:
+            with self._lock:
+                batch, self._queue = self._queue[:self.max_batch], self._queue[self.max_batch:]
+                if not batch:
+                    self._collecting = False
+                    self._batch_full.clear()
+                    return
+            self._run_batch(batch)
+
+    def _run_batch(self, batch):
+        started = time.perf_counter()
+        try:
+            vectors = self.embed([pending.text for pending in batch])
+            if len(vectors) != len(batch):
+                raise ValueError(f"embed returned {len(vectors)} vectors for {len(batch)} texts")
+            packed = [self._pack(vector, self.dtype) for vector in vectors]
+        except Exception as e:
+            with self._lock:
+                self._counts['embed_calls'] += 1
+                self._counts['errors'] += 1
+                for pending in batch:
+                    pending.error = e
+                    del self._inflight[pending.text]
+            for pending in batch:
+                pending.done.set()
+            return
+        elapsed = time.perf_counter() - started
+
+        if self._vectors_file is not None:
+            try:
+                self._write_disk([(pending.text, data) for pending, data in zip(batch, packed)])
+            except OSError as e:
+                print(f"Warning: could not store embeddings in {self.directory}: {e}", file=sys.stderr)
+        with self._lock:
+            self._counts['embed_calls'] += 1
+            self._embed_seconds += elapsed
+            for pending, data in zip(batch, packed):
+                pending.vector = data
+                self._remember(pending.text, data)
+                del self._inflight[pending.text]
+        for pending in batch:
+            pending.done.set()
+
+    def stats(self):
+        """
+        Request counts, hit rate and an estimate of the embedding latency saved:
+        every request answered without its own embeddings call is credited with
+        the mean duration of one call.
+        """
+        with self._lock:
+            stats = dict(self._counts)
+            calls = stats['embed_calls'] - stats['errors']
+            mean_latency = self._embed_seconds / calls if calls else 0.0
+            answered = stats['memory_hits'] + stats['disk_hits'] + stats['shared']
+            stats.update(
+                hit_rate=answered / stats['requests'] if stats['requests'] else 0.0,
+                embed_seconds=self._embed_seconds,
+                mean_embed_ms=mean_latency * 1000,
+                saved_seconds=(stats['requests'] - calls) * mean_latency,
+                memory_entries=len(self._memory),
+                disk_entries=len(self._disk),
+            )
+        return stats
+
+    def close(self):
+        if self._vectors_file is not None:
+            self._vectors_file.close()
+            self._index_file.close()
+            self._vectors_file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class FakeEmbedder:
+    """
+    Stand-in for the embeddings API: deterministic unit vectors derived from the
+    text, a fixed latency per call, and a record of every batch it was sent.
+    """
+
+    def __init__(self, dim=1536, latency=0.05):
+        self.dim = dim
+        self.latency = latency
+        self.batches = []
+        self.lock = threading.Lock()
+
+    def vector(self, text):
+        rng = random.Random(hashlib.sha1(text.encode('utf-8')).digest())
+        vector = [rng.gauss(0, 1) for _ in range(self.dim)]
+        norm = sum(x * x for x in vector) ** 0.5
+        return [x / norm for x in vector]
+
+    def __call__(self, texts):
+        with self.lock:
+            self.batches.append(list(texts))
+        time.sleep(self.latency)
+        return [self.vector(text) for text in texts]
+
+
+def _run_clients(cache, queries, clients):
+    """Sends `queries` from `clients` threads at once and returns the wall time."""
+    chunks = [queries[i::clients] for i in range(clients)]
+    threads = [threading.Thread(target=lambda chunk=chunk: [cache.get(query) for query in chunk]) for chunk in chunks]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exercise the embedding cache against a fake embedder and check its behaviour.")
+    parser.add_argument("--queries", type=int, default=2000, help="Queries to send (default: 2000).")
+    parser.add_argument("--distinct", type=int, default=300, help="Distinct query texts, drawn with a popularity skew (default: 300).")
+    parser.add_argument("--clients", type=int, default=16, help="Concurrent client threads (default: 16).")
+    parser.add_argument("--latency", type=float, default=0.05, help="Fake embeddings call latency in seconds (default: 0.05).")
+    parser.add_argument("--dim", type=int, default=1536, help="Vector dimension (default: 1536).")
+    parser.add_argument("--directory", default=None, help="Disk store directory (default: a temporary directory).")
+    args = parser.parse_args()
+
+    directory = args.directory or tempfile.mkdtemp(prefix='embedding-cache-')
+    rng = random.Random(0)
+    texts = [f"請求損害賠償事件 第{i}號 查詢" for i in range(args.distinct)]
+    weights = [1 / (rank + 1) for rank in range(args.distinct)]
+    queries = rng.choices(texts, weights=weights, k=args.queries)
+    # Frontend retries: full-width and padded spellings of the same query.
+    queries += [f"  {text.replace('第', '第 ')} " for text in texts[:20]] + [texts[0].replace('1', '１')] * 5
+
+    problems = []
+    embedder = FakeEmbedder(args.dim, args.latency)
+    with EmbeddingCache(embedder, directory=directory, max_entries=args.distinct // 2) as cache:
+        elapsed = _run_clients(cache, queries, args.clients)
+        stats = cache.stats()
+        sample = cache.get(texts[0])
+
+    distinct_keys = len({normalize_query(query) for query in queries})
+    sent = [text for batch in embedder.batches for text in batch]
+    print(f"Cold run: {len(queries)} queries from {args.clients} clients in {elapsed:.2f}s, "
+          f"{len(sent)} texts embedded in {len(embedder.batches)} calls")
+    print(f"  {json.dumps({key: round(value, 3) if isinstance(value, float) else value for key, value in stats.items()})}")
+    if len(sent) != len(set(sent)) or len(sent) != distinct_keys:
+        problems.append(f"{len(sent)} texts embedded ({len(set(sent))} distinct) for {distinct_keys} distinct queries")
+    if len(embedder.batches) >= len(sent):
+        problems.append("misses were never batched together")
+    error = max(abs(a - b) for a, b in zip(sample, embedder.vector(normalize_query(texts[0]))))
+    if error > 1e-3:
+        problems.append(f"cached vector differs from the embedder's by {error:.2e}")
+
+    warm = FakeEmbedder(args.dim, args.latency)
+    with EmbeddingCache(warm, directory=directory) as cache:
+        elapsed = _run_clients(cache, queries, args.clients)
+        stats = cache.stats()
+        restored = cache.get(texts[0])
+    print(f"Warm run (new process, same directory): {elapsed:.2f}s, {stats['disk_hits']} disk hits, "
+          f"{stats['memory_hits']} memory hits, {len(warm.batches)} embeddings calls")
+    if warm.batches:
+        problems.append(f"warm run still called the embedder {len(warm.batches)} times")
+    if restored != sample:
+        problems.append("vector read back from disk differs from the one first returned")
+
+    if not args.directory:
+        shutil.rmtree(directory, ignore_errors=True)
+    if problems:
+        print(f"\n❌ {len(problems)} problems:")
+        for problem in problems:
+            print(f"  - {problem}")
+    else:
+        print("\n✅ Each distinct query was embedded once, misses were batched, and the disk store answered every query after a restart.")
+    sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
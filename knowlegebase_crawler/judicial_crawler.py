@@ -1,120 +1,261 @@
 import requests
-from bs4 import BeautifulSoup
-import json
-import time
+from requests.adapters import HTTPAdapter
+import argparse
+import hashlib
 import os
-import re
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from urllib.parse import urlparse, parse_qs, urlencode
 from tqdm import tqdm
 
+from case_parsers import PARSERS, get_parser
+from crawl_store import CrawlStore
+
 requests.packages.urllib3.disable_warnings(requests.packages.urllib3.exceptions.InsecureRequestWarning)
 
-def get_case_content(case_url):
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.36'
+}
+
+# Fetch defaults: a handful of workers sharing a per-host budget of roughly
+# one request per second keeps us as polite as the old fixed sleeps on average,
+# while letting slow detail pages overlap instead of queueing behind each other.
+DEFAULT_MAX_WORKERS = 4
+DEFAULT_RATE = 1.0          # sustained requests per second, per host
+DEFAULT_BURST = 4           # requests allowed back-to-back before throttling
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF = 1.0       # seconds; doubled on every further attempt
+DEFAULT_TIMEOUT = 30
+DEFAULT_STORE = 'judicial_cases_store'
+
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` tokens per second, at most `capacity` banked."""
+
+    def __init__(self, rate, capacity):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Blocks until a token is available, then consumes it."""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class HostRateLimiter:
+    """Hands out one TokenBucket per host so every worker shares the same budget."""
+
+    def __init__(self, rate=DEFAULT_RATE, burst=DEFAULT_BURST):
+        self.rate = rate
+        self.burst = burst
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def acquire(self, url):
+        if not self.rate or self.rate <= 0:
+            return
+        host = urlparse(url).netloc
+        with self.lock:
+            bucket = self.buckets.get(host)
+            if bucket is None:
+                bucket = self.buckets[host] = TokenBucket(self.rate, max(1, self.burst))
+        bucket.acquire()
+
+
+def create_session(pool_size=DEFAULT_MAX_WORKERS):
+    """Creates a requests.Session whose connection pool is large enough for all workers."""
+    session = requests.Session()
+    session.headers.update(HEADERS)
+    session.verify = False
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def fetch(session, url, limiter=None, retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF, timeout=DEFAULT_TIMEOUT):
+    """
+    GETs a URL through the shared session, honouring the per-host rate limit.
+
+    Timeouts, connection errors and 5xx responses are retried with exponential
+    backoff; any other HTTP error is raised immediately.
+    """
+    attempt = 0
+    while True:
+        if limiter is not None:
+            limiter.acquire(url)
+        try:
+            response = session.get(url, timeout=timeout)
+            if response.status_code < 500:
+                response.raise_for_status()
+                return response
+            error = requests.exceptions.HTTPError(f"{response.status_code} Server Error for url: {url}", response=response)
+        except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
+            error = e
+
+        if attempt >= retries:
+            raise error
+        delay = backoff * (2 ** attempt) * (1 + random.random() * 0.25)
+        print(f"  - Retrying {url} in {delay:.1f}s ({error})")
+        time.sleep(delay)
+        attempt += 1
+
+
+def record_html(directory, kind, url, page_html):
+    """Saves a fetched page under `directory/kind/` so it can be replayed as a parser fixture."""
+    if not directory:
+        return
+    path = os.path.join(directory, kind)
+    os.makedirs(path, exist_ok=True)
+    filename = hashlib.sha1(url.encode('utf-8')).hexdigest()[:16] + '.html'
+    with open(os.path.join(path, filename), 'w', encoding='utf-8') as f:
+        f.write(page_html)
+
+
+def get_case_content(case_url, session=None, limiter=None, retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF,
+                     parser=None, record_dir=None, timeout=DEFAULT_TIMEOUT):
     """Fetches and parses the content of a single case page."""
+    owns_session = session is None
+    if owns_session:
+        session = create_session(pool_size=1)
     try:
-        response = requests.get(case_url, headers={
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.36'
-        }, verify=False)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.text, 'html.parser')
-
-        data = {}
-        
-        # Extract header info
-        header_mapping = {
-            '裁判字號：': 'case_id',
-            '案由摘要：': 'case_summary',
-            '裁判日期：': 'case_date',
-            '裁判要旨：': 'case_gist'
-        }
-
-        # New extraction logic based on the screenshot
-        int_table = soup.find('div', class_='int-table')
-        if int_table:
-            rows = int_table.find_all('div', class_='row')
-            for row in rows:
-                label_div = row.find('div', class_='col-th')
-                value_div = row.find('div', class_='col-td')
-                if label_div and value_div:
-                    label = label_div.text.strip()
-                    value = value_div.text.strip()
-                    if label in header_mapping:
-                        data[header_mapping[label]] = value
-
-        return data
+        if parser is None:
+            parser = get_parser()
+        response = fetch(session, case_url, limiter=limiter, retries=retries, backoff=backoff, timeout=timeout)
+        record_html(record_dir, 'detail', case_url, response.text)
+        return parser.parse_case(response.text)
 
     except requests.exceptions.RequestException as e:
         print(f"Error fetching {case_url}: {e}")
         return None
+    finally:
+        if owns_session:
+            session.close()
 
-def crawl_judicial_website(base_url, start_page=1):
-    """Crawls the judicial website starting from the given base URL and page number."""
+
+def fetch_cases(case_urls, session, limiter, max_workers=DEFAULT_MAX_WORKERS, retries=DEFAULT_RETRIES,
+                backoff=DEFAULT_BACKOFF, parser=None, record_dir=None, desc=None, timeout=DEFAULT_TIMEOUT):
+    """
+    Fetches case pages concurrently with a bounded worker pool.
+
+    Returns (case_url, case) pairs in the same order as `case_urls`; cases that
+    still failed after all retries are left out.
+    """
+    results = [None] * len(case_urls)
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        futures = {
+            executor.submit(get_case_content, case_url, session, limiter, retries, backoff, parser, record_dir, timeout): index
+            for index, case_url in enumerate(case_urls)
+        }
+        for future in tqdm(as_completed(futures), total=len(futures), desc=desc):
+            results[futures[future]] = future.result()
+    return [(case_url, case) for case_url, case in zip(case_urls, results) if case]
+
+
+def crawl_judicial_website(base_url, start_page=1, store=None, max_workers=DEFAULT_MAX_WORKERS, rate=DEFAULT_RATE,
+                           burst=DEFAULT_BURST, retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF,
+                           parser_name='auto', record_dir=None, session=None, timeout=DEFAULT_TIMEOUT):
+    """
+    Crawls the judicial website starting from the given base URL and page number.
+
+    Cases are appended to `store` (a CrawlStore) with a checkpoint after every
+    results page. Case pages whose URL is already in the store are not fetched.
+    A `session` can be passed in (e.g. one pointed at a local stand-in server);
+    otherwise a pooled session sized to `max_workers` is created and closed here.
+    """
     page = start_page
-    output_filename = 'judicial_cases.json'
+    owns_session = session is None
+    if owns_session:
+        session = create_session(pool_size=max_workers)
+    limiter = HostRateLimiter(rate=rate, burst=burst)
+    parser = get_parser(parser_name)
+    owns_store = store is None
+    if owns_store:
+        store = CrawlStore(DEFAULT_STORE)
 
-    while True:
-        url = f"{base_url}&page={page}"
-        print(f"Crawling page: {page} at {url}")
+    try:
+        while True:
+            url = f"{base_url}&page={page}"
+            print(f"Crawling page: {page} at {url}")
 
-        try:
-            response = requests.get(url, headers={
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.36'
-            }, verify=False)
-            response.raise_for_status()
-            soup = BeautifulSoup(response.text, 'html.parser')
+            try:
+                response = fetch(session, url, limiter=limiter, retries=retries, backoff=backoff, timeout=timeout)
+                record_html(record_dir, 'list', url, response.text)
+                case_hrefs, has_next_page = parser.parse_list(response.text)
+
+                if not case_hrefs:
+                    print("No more case links found. Ending crawl.")
+                    store.mark_done(base_url)
+                    break
+
+                case_urls = [requests.compat.urljoin(url, href) for href in case_hrefs]
+                new_case_urls = [case_url for case_url in case_urls if not store.has_url(case_url)]
+                for case_url in new_case_urls:
+                    print(f"  - Found case: {case_url}")
+                if len(new_case_urls) < len(case_urls):
+                    print(f"  - Skipping {len(case_urls) - len(new_case_urls)} cases already in the store")
+                page_cases = fetch_cases(new_case_urls, session, limiter, max_workers=max_workers,
+                                         retries=retries, backoff=backoff, parser=parser, record_dir=record_dir,
+                                         desc=f"Scraping page {page}", timeout=timeout)
 
-            # Correctly select case links based on the provided screenshot
-            case_links = soup.find_all('a', class_='hlTitle_scroll')
+                written = store.append_page(base_url, page, page_cases, done=not has_next_page)
+                print(f"Page {page} crawled, {written} new cases saved to {store.directory}")
 
-            if not case_links:
-                print("No more case links found. Ending crawl.")
+                # Check for a 'next' page link to decide if we should continue
+                if not has_next_page:
+                     print("No 'next page' link found. Assuming end of results.")
+                     break
+
+                page += 1
+
+            except requests.exceptions.RequestException as e:
+                print(f"Error crawling page {page}: {e}")
                 break
 
-            page_cases = []
-            for link in tqdm(case_links, desc=f"Scraping page {page}"):
-                case_url = requests.compat.urljoin(url, link['href'])
-                print(f"  - Found case: {case_url}")
-                case_data = get_case_content(case_url)
-                if case_data:
-                    page_cases.append(case_data)
-                time.sleep(1)  # Respectful delay
-
-            if page_cases:
-                # Load existing data, append new data, and save
-                existing_data = []
-                if os.path.exists(output_filename):
-                    with open(output_filename, 'r', encoding='utf-8') as f:
-                        try:
-                            existing_data = json.load(f)
-                            if not isinstance(existing_data, list):
-                                existing_data = []
-                        except json.JSONDecodeError:
-                            existing_data = []
-                
-                existing_data.extend(page_cases)
-                with open(output_filename, 'w', encoding='utf-8') as f:
-                    json.dump(existing_data, f, ensure_ascii=False, indent=4)
-                print(f"Page {page} crawled and data updated in {output_filename}")
-
-
-            # Check for a 'next' page link to decide if we should continue
-            next_page_link = soup.find('a', string=re.compile(r'下一頁'))
-            if not next_page_link:
-                 print("No 'next page' link found. Assuming end of results.")
-                 break
-
-            page += 1
-            time.sleep(2) # Delay between pages
-
-        except requests.exceptions.RequestException as e:
-            print(f"Error crawling page {page}: {e}")
-            break
-    
-    print(f"Crawling finished. Data saved to {output_filename}")
+    finally:
+        # Also reached when a worker raises something other than a RequestException.
+        if owns_session:
+            session.close()
+        if owns_store:
+            store.close()
+    print(f"Crawling finished. Data saved to {store.directory}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Crawl case decisions from the Taiwanese judicial website.")
+    parser.add_argument("urls", nargs='*', help="Starting URLs (prompted for when omitted).")
+    parser.add_argument("--store", default=DEFAULT_STORE, help=f"Crawl store directory (default: {DEFAULT_STORE}).")
+    parser.add_argument("--restart", action="store_true", help="Ignore saved checkpoints and start from the page in the URL.")
+    parser.add_argument("--parser", default="auto", choices=sorted(PARSERS), help="Page parser: fast with BeautifulSoup fallback (auto), fast only, or soup (default: auto).")
+    parser.add_argument("--record-html", default=None, help="Also save every fetched page under this directory (list/ and detail/), e.g. as parser fixtures.")
+    parser.add_argument("--workers", type=int, default=DEFAULT_MAX_WORKERS, help=f"Concurrent case page fetches (default: {DEFAULT_MAX_WORKERS}).")
+    parser.add_argument("--rate", type=float, default=DEFAULT_RATE, help=f"Requests per second per host, 0 to disable (default: {DEFAULT_RATE}).")
+    parser.add_argument("--burst", type=int, default=DEFAULT_BURST, help=f"Token bucket size per host (default: {DEFAULT_BURST}).")
+    parser.add_argument("--retries", type=int, default=DEFAULT_RETRIES, help=f"Retries on timeouts and 5xx responses (default: {DEFAULT_RETRIES}).")
+    parser.add_argument("--backoff", type=float, default=DEFAULT_BACKOFF, help=f"Initial retry backoff in seconds (default: {DEFAULT_BACKOFF}).")
+    return parser.parse_args()
+
 
 if __name__ == "__main__":
-    urls_input = input("Please enter one or more starting URLs from the Taiwanese judicial website, separated by spaces: ")
-    urls = urls_input.split()
+    args = parse_args()
+    urls = args.urls
+    if not urls:
+        urls_input = input("Please enter one or more starting URLs from the Taiwanese judicial website, separated by spaces: ")
+        urls = urls_input.split()
+    store = CrawlStore(args.store)
     for start_url in urls:
         print(f"\nProcessing URL: {start_url}")
         if start_url:
@@ -132,7 +273,15 @@ if __name__ == "__main__":
             # Reconstruct the base URL without the page parameter for clean processing
             query_params.pop('page', None)
             query_params.pop('Page', None)
-            
+
             base_url_for_paging = f"{parsed_url.scheme}://{parsed_url.netloc}{parsed_url.path}?{urlencode(query_params, doseq=True)}"
-            
-            crawl_judicial_website(base_url_for_paging, start_page)
\ No newline at end of file
+
+            resume_page = None if args.restart else store.resume_page(base_url_for_paging)
+            if resume_page is not None:
+                print(f"Resuming from page {resume_page} (last completed page: {resume_page - 1})")
+                start_page = resume_page
+
+            crawl_judicial_website(base_url_for_paging, start_page, store=store, max_workers=args.workers, rate=args.rate,
+                                   burst=args.burst, retries=args.retries, backoff=args.backoff,
+                                   parser_name=args.parser, record_dir=args.record_html)
+    store.close()
@@ -0,0 +1,440 @@
+import argparse
+import glob
+import heapq
+import json
+import math
+import operator
+import os
+import pickle
+import re
+import sys
+import threading
+import time
+
+from category_index import NUMERAL_CHARS, format_statute
+
+# Indexed fields and their BM25F weights. dispute/opinion are only present on
+# records exported from case_2; crawled cases carry topic/summary/gist.
+FIELD_WEIGHTS = {
+    'case_topic': 2.0,
+    'case_summary': 1.5,
+    'case_gist': 1.0,
+    'dispute': 1.0,
+    'opinion': 0.8,
+}
+FIELDS = tuple(FIELD_WEIGHTS)
+
+K1 = 1.2
+B = 0.75
+STATUTE_BOOST = 3.0   # a cited article counts as this many query bigrams
+
+# Law names recognised in free text, matched longest first so that
+# '依民事訴訟法第277條' cites 民事訴訟法 rather than 法.
+LAW_NAMES = sorted((
+    '民法', '民事訴訟法', '公司法', '強制執行法', '保險法', '土地法', '海商法', '票據法', '破產法',
+    '勞動基準法', '勞基法', '專利法', '著作權法', '仲裁法', '證券交易法', '國家賠償法', '非訟事件法',
+    '商標法', '商務仲裁條例', '信託法', '耕地三七五減租條例', '三七五減租條例', '七五減租條例',
+    '公寓大廈管理條例', '消費者保護法', '平均地權條例', '土地登記規則', '刑事訴訟法', '刑法', '銀行法',
+    '民事訴訟費用法', '農業發展條例', '提存法', '公平交易法', '建築法', '家事事件法', '公證法', '憲法',
+    '民法繼承編施行法', '民法物權編施行法', '民法債編施行法', '民法親屬編施行法', '民法總則施行法',
+    '政府採購法', '醫療法', '企業併購法', '智慧財產案件審理法', '勞工退休金條例', '勞資爭議處理法',
+    '行政執行法', '行政程序法', '行政訴訟法', '法院組織法', '中央法規標準法', '涉外民事法律適用法',
+    '臺灣地區與大陸地區人民關係條例', '台灣地區與大陸地區人民關係條例', '動產擔保交易法', '稅捐稽徵法',
+    '遺產及贈與稅法', '祭祀公業條例', '民事訴訟法施行法', '強制執行法施行細則',
+    # Laws whose names end in one of the names above, so they aren't filed under e.g. 保險法.
+    '全民健康保險法', '強制汽車責任保險法', '公教人員保險法', '勞工保險法', '涉民法',
+    '實施都市平均地權條例', '智慧財產法院組織法',
+), key=len, reverse=True)
+
+# Foreign codes cited for comparison: '日本民法第176條' is not 民法第176條.
+FOREIGN_LAW_PREFIXES = ('日本', '德國', '法國', '美國', '英國', '瑞士', '奧國', '奧地利', '加拿大', '韓國')
+
+_CJK_RUN_RE = re.compile(r'[㐀-鿿豈-﫿]+')
+_WRAPPED_CJK_RE = re.compile(r'(?<=[㐀-鿿豈-﫿])\s+(?=[㐀-鿿豈-﫿])')
+_ASCII_WORD_RE = re.compile(r'[0-9A-Za-z]+')
+_ARTICLE_RE = re.compile(rf'第\s*([{NUMERAL_CHARS}]+)\s*條(?:\s*之\s*([{NUMERAL_CHARS}]+))?')
+
+
+def join_wrapped_lines(text):
+    """
+    Removes whitespace and line breaks between CJK characters. Crawled text wraps
+    lines in the middle of words ('民事訴訟\\r\\n法第五十六條'), which would
+    otherwise split bigrams and law names.
+    """
+    return _WRAPPED_CJK_RE.sub('', text)
+
+
+def tokenize(text):
+    """Character bigrams for CJK runs (single characters stay unigrams) plus lower-cased ASCII words."""
+    tokens = []
+    for run in _CJK_RUN_RE.findall(text):
+        if len(run) == 1:
+            tokens.append(run)
+        else:
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    tokens.extend(word.lower() for word in _ASCII_WORD_RE.findall(text))
+    return tokens
+
+
+def _find_statutes(text):
+    """Yields (canonical statute, start, end) for every citation in the text (see join_wrapped_lines)."""
+    last_law = None
+    for match in _ARTICLE_RE.finditer(text):
+        window_start = max(0, match.start() - 20)
+        prefix = text[window_start:match.start()].rstrip()
+        law = next((name for name in LAW_NAMES if prefix.endswith(name)), None)
+        if law is not None and prefix[:-len(law)].endswith(FOREIGN_LAW_PREFIXES):
+            last_law = None
+            continue
+        cited = law
+        if law is None and prefix.endswith('同法'):
+            law, cited = last_law, '同法'
+        if law is None:
+            continue
+        last_law = law
+        start = window_start + len(prefix) - len(cited)
+        yield format_statute(law, match.group(1), match.group(2)), start, match.end()
+
+
+def extract_statutes(text):
+    """
+    Finds statute citations such as '民法第1030條之3', '依民事訴訟法第二百七十七條'
+    or '同法第95條' and returns them in canonical form.
+    """
+    return [statute for statute, _, _ in _find_statutes(join_wrapped_lines(text))]
+
+
+# Citations that must be found at exactly this span of the (joined) text (see --check).
+STATUTE_SPAN_CHECKS = [
+    ('民法第184條', '民法第184條'),
+    ('請求損害賠償事件中關於侵權行為之成立要件與舉證責任分配依照民法第184條', '民法第184條'),
+    ('依民事訴訟法第二百七十七條規定', '民事訴訟法第二百七十七條'),
+    ('本件上訴人依民法第767條請求返還，並依同法第179條請求不當得利', '同法第179條'),
+    ('依民事訴訟\r\n法第五十六條', '民事訴訟法第五十六條'),
+]
+
+# Texts and the statutes extract_statutes must find in them (see --check).
+STATUTE_EXTRACT_CHECKS = [
+    ('依民事訴訟\r\n法第五十六條', ['民事訴訟法第56條']),
+    ('民\r\n法第 764 條', ['民法第764條']),
+    ('依涉民法第58條', ['涉民法第58條']),
+    ('強制汽車責任保險法第30條', ['強制汽車責任保險法第30條']),
+    ('當時日本民法第176條及同法第177條', []),
+]
+
+
+def run_checks():
+    """Returns a list of mismatch descriptions for the statute checks and a wrapped-text search."""
+    mismatches = []
+    for text, citation in STATUTE_SPAN_CHECKS:
+        joined = join_wrapped_lines(text)
+        spans = [joined[start:end] for _, start, end in _find_statutes(joined)]
+        if citation not in spans:
+            mismatches.append(f"{text!r}: expected span {citation!r}, got {spans!r}")
+    for text, expected in STATUTE_EXTRACT_CHECKS:
+        found = extract_statutes(text)
+        if found != expected:
+            mismatches.append(f"{text!r}: expected statutes {expected!r}, got {found!r}")
+
+    index = KeywordIndex()
+    index.add_many([{'case_id': 'wrapped', 'case_gist': '侵權\r\n行為，依民\r\n法第184條'}])
+    for query, options in (('侵權行為', {'match_all': True}), ('民法第184條', {})):
+        if not index.search(query, **options):
+            mismatches.append(f"search({query!r}) does not find a case whose text wraps inside the words")
+    return mismatches
+
+
+def _statute_term(statute):
+    return '§' + statute
+
+
+def _encode_varints(numbers, out):
+    for number in numbers:
+        while number >= 0x80:
+            out.append((number & 0x7f) | 0x80)
+            number >>= 7
+        out.append(number)
+
+
+def _decode_varints(data):
+    if data.isascii():
+        # Every value fits in one byte, which is the common case for gaps and tfs.
+        return list(data)
+    numbers = []
+    number = shift = 0
+    for byte in data:
+        number |= (byte & 0x7f) << shift
+        if byte & 0x80:
+            shift += 7
+        else:
+            numbers.append(number)
+            number = shift = 0
+    return numbers
+
+
+class KeywordIndex:
+    """
+    BM25 keyword index for Traditional Chinese case text.
+
+    Text is indexed as character bigrams, so a query like 意思表示 matches
+    without a word segmenter, and statute citations are additionally indexed
+    as exact-phrase terms in canonical form ('民法第1030條之3'). Scoring is
+    BM25F over the fields in FIELD_WEIGHTS.
+
+    Postings are kept compressed: per term, a varint stream of
+    (doc id gap, tf per field). New and updated cases go into a small
+    uncompressed delta segment that is merged in by `compact()`, which runs
+    automatically once the delta grows past `compact_threshold` cases.
+    """
+
+    def __init__(self, compact_threshold=500):
+        self.compact_threshold = compact_threshold
+        self.doc_case_ids = []      # doc id -> case_id (None once deleted)
+        self.doc_lengths = []       # doc id -> token count per field
+        self.case_docs = {}         # case_id -> live doc id
+        self.postings = {}          # term -> compressed postings (bytes)
+        self.delta = {}             # term -> {doc id: tf per field}, not yet compressed
+        self.deleted = set()
+        self.delta_docs = 0
+        self.field_totals = [0] * len(FIELDS)
+        self._doc_factors = None    # doc id -> BM25F weight / length norm per field, rebuilt lazily
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.case_docs)
+
+    def add(self, case, auto_compact=True):
+        """Adds a case, replacing any earlier version with the same case_id."""
+        case_id = case.get('case_id')
+        if not case_id:
+            return
+        term_freqs = {}
+        lengths = []
+        for field_number, field in enumerate(FIELDS):
+            text = join_wrapped_lines(case.get(field) or '')
+            tokens = tokenize(text)
+            tokens.extend(_statute_term(statute) for statute in extract_statutes(text))
+            lengths.append(len(tokens))
+            for token in tokens:
+                tfs = term_freqs.get(token)
+                if tfs is None:
+                    tfs = term_freqs[token] = [0] * len(FIELDS)
+                tfs[field_number] += 1
+
+        with self._lock:
+            self.remove(case_id)
+            doc = len(self.doc_case_ids)
+            self.doc_case_ids.append(case_id)
+            self.doc_lengths.append(lengths)
+            self.case_docs[case_id] = doc
+            for field_number, length in enumerate(lengths):
+                self.field_totals[field_number] += length
+            for term, tfs in term_freqs.items():
+                self.delta.setdefault(term, {})[doc] = tfs
+            self._doc_factors = None
+            self.delta_docs += 1
+            if auto_compact and self.delta_docs >= self.compact_threshold:
+                self.compact()
+
+    def add_many(self, cases):
+        """Bulk load: everything goes into the delta segment and is compressed once."""
+        for case in cases:
+            self.add(case, auto_compact=False)
+        self.compact()
+
+    def remove(self, case_id):
+        with self._lock:
+            doc = self.case_docs.pop(case_id, None)
+            if doc is None:
+                return
+            self.deleted.add(doc)
+            self.doc_case_ids[doc] = None
+            for field_number, length in enumerate(self.doc_lengths[doc]):
+                self.field_totals[field_number] -= length
+            self._doc_factors = None
+
+    def _factors(self):
+        """Per-doc BM25F field factors, w_f / (1 - b + b * len_f / avglen_f)."""
+        if self._doc_factors is None:
+            doc_count = len(self.case_docs) or 1
+            average_lengths = [total / doc_count or 1 for total in self.field_totals]
+            weights = [FIELD_WEIGHTS[field] for field in FIELDS]
+            self._doc_factors = [
+                [weight / (1 - B + B * length / average) for weight, length, average in zip(weights, lengths, average_lengths)]
+                for lengths in self.doc_lengths
+            ]
+        return self._doc_factors
+
+    def _decode(self, term):
+        """Returns {doc id: tf per field} for a term, including uncompressed and deleted docs."""
+        entries = {}
+        data = self.postings.get(term)
+        if data:
+            numbers = _decode_varints(data)
+            width = len(FIELDS) + 1
+            doc = 0
+            for i in range(0, len(numbers), width):
+                doc += numbers[i]
+                entries[doc] = numbers[i + 1:i + width]
+        delta = self.delta.get(term)
+        if delta:
+            entries.update(delta)
+        return entries
+
+    def compact(self):
+        """Merges the delta segment into the compressed postings and drops deleted docs."""
+        with self._lock:
+            terms = set(self.delta)
+            if self.deleted:
+                terms = self.postings.keys() | terms
+            for term in terms:
+                entries = self._decode(term)
+                out = bytearray()
+                previous = 0
+                live = 0
+                for doc in sorted(entries):
+                    if doc in self.deleted:
+                        continue
+                    _encode_varints((doc - previous,), out)
+                    _encode_varints(entries[doc], out)
+                    previous = doc
+                    live += 1
+                if live:
+                    self.postings[term] = bytes(out)
+                else:
+                    self.postings.pop(term, None)
+            self.delta = {}
+            self.deleted = set()
+            self.delta_docs = 0
+
+    def search(self, query, limit=20, match_all=False):
+        """
+        Returns [{'case_id', 'score', 'statutes'}] ranked by BM25F.
+
+        Statute citations in the query are matched as exact phrases and boosted.
+        With match_all=True only cases containing every query term are returned,
+        the closest equivalent of the old substring filter.
+        """
+        query = join_wrapped_lines(query)
+        statutes = []
+        remainder = query
+        for statute, start, end in reversed(list(_find_statutes(query))):
+            # The citation is matched as a phrase, not by its very common bigrams (民法, 法第, ...).
+            statutes.insert(0, statute)
+            remainder = remainder[:start] + ' ' + remainder[end:]
+        query_terms = {}
+        for token in tokenize(remainder):
+            query_terms[token] = query_terms.get(token, 0) + 1
+        for statute in statutes:
+            query_terms[_statute_term(statute)] = STATUTE_BOOST
+
+        with self._lock:
+            doc_count = len(self.case_docs)
+            if not doc_count or not query_terms:
+                return []
+            factors = self._factors()
+
+            scores = {}
+            hits = {}
+            for term, query_weight in query_terms.items():
+                entries = self._decode(term)
+                for doc in self.deleted.intersection(entries):
+                    del entries[doc]
+                if not entries:
+                    if match_all:
+                        return []
+                    continue
+                df = len(entries)
+                idf = math.log(1 + (doc_count - df + 0.5) / (df + 0.5))
+                for doc, tfs in entries.items():
+                    tf = sum(map(operator.mul, factors[doc], tfs))
+                    scores[doc] = scores.get(doc, 0.0) + query_weight * idf * tf * (K1 + 1) / (tf + K1)
+                    hits[doc] = hits.get(doc, 0) + 1
+
+            if match_all:
+                scores = {doc: score for doc, score in scores.items() if hits[doc] == len(query_terms)}
+            best = heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+            return [
+                {'case_id': self.doc_case_ids[doc], 'score': round(score, 4), 'statutes': statutes}
+                for doc, score in best
+            ]
+
+    def stats(self):
+        with self._lock:
+            return {
+                'cases': len(self.case_docs),
+                'terms': len(self.postings.keys() | self.delta.keys()),
+                'postings_bytes': sum(len(data) for data in self.postings.values()),
+            }
+
+    def save(self, path):
+        with self._lock:
+            self.compact()
+            state = {key: value for key, value in self.__dict__.items() if key not in ('_lock', '_doc_factors')}
+        with open(path, 'wb') as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def load(cls, path):
+        index = cls()
+        with open(path, 'rb') as f:
+            index.__dict__.update(pickle.load(f))
+        return index
+
+
+def iter_case_files(patterns):
+    """Yields crawled cases from JSON list files (e.g. splitted_jcases/*.json) or a crawl store's cases.jsonl."""
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            pattern = os.path.join(pattern, '*.json')
+        for path in sorted(glob.glob(pattern)):
+            with open(path, 'r', encoding='utf-8') as f:
+                if path.endswith('.jsonl'):
+                    for line in f:
+                        if line.strip():
+                            yield json.loads(line)
+                else:
+                    for case in json.load(f):
+                        if isinstance(case, dict) and case.get('case_id'):
+                            yield case
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build a bigram BM25 index over crawled cases and query it.")
+    parser.add_argument("query", nargs='*', help="Queries to run against the index.")
+    parser.add_argument("--cases", nargs='+', default=["splitted_jcases"], help="Case files, globs or directories (default: splitted_jcases).")
+    parser.add_argument("--index", default=None, help="Load the index from this file if it exists, otherwise build and save it there.")
+    parser.add_argument("--limit", type=int, default=10, help="Results per query (default: 10).")
+    parser.add_argument("--all", action='store_true', help="Only return cases containing every query term.")
+    parser.add_argument("--check", action='store_true', help="Check statute extraction and query spans, including text wrapped mid-word, then exit.")
+    args = parser.parse_args()
+
+    if args.check:
+        mismatches = run_checks()
+        for mismatch in mismatches:
+            print(f"  - {mismatch}")
+        print(f"❌ {len(mismatches)} statute check mismatches" if mismatches else "✅ Statute spans, extraction and wrapped-text search match.")
+        sys.exit(1 if mismatches else 0)
+
+    started = time.perf_counter()
+    if args.index and os.path.exists(args.index):
+        index = KeywordIndex.load(args.index)
+        print(f"Loaded index in {time.perf_counter() - started:.2f}s: {index.stats()}")
+    else:
+        index = KeywordIndex()
+        index.add_many(iter_case_files(args.cases))
+        print(f"Built index in {time.perf_counter() - started:.2f}s: {index.stats()}")
+        if args.index:
+            index.save(args.index)
+
+    for query in args.query:
+        started = time.perf_counter()
+        results = index.search(query, limit=args.limit, match_all=args.all)
+        elapsed = (time.perf_counter() - started) * 1000
+        print(f"\n{query}: {len(results)} results in {elapsed:.1f} ms")
+        for result in results:
+            print(f"  {result['score']:8.3f}  {result['case_id']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,76 +1,178 @@
 import json
-import copy
+import glob
 import os
 import argparse
 import sys
+import time
 
-def merge_data(a, b):
+try:
+    import ijson
+except ImportError:  # Fall back to loading one input file at a time.
+    ijson = None
+
+try:
+    import resource
+except ImportError:  # Not available on Windows.
+    resource = None
+
+# Errors that mean an input is not valid JSON.
+DECODE_ERRORS = (json.JSONDecodeError, ValueError) + ((ijson.JSONError,) if ijson is not None else ())
+
+
+def iter_categories(path):
     """
-    Merges dataset 'a' into a deep copy of dataset 'b'.
-    This version is robust and handles missing 'subcategories' and 'related_case_id' keys.
+    Yields the categories of one dataset file.
+
+    With ijson installed the file is streamed one category at a time; otherwise
+    it is loaded whole, which still only keeps a single input in memory.
     """
-    merged_data = copy.deepcopy(b)
-    category_map = {cat.get('category_id'): cat for cat in merged_data if cat.get('category_id') is not None}
-
-    for category_a in a:
-        cat_id_a = category_a.get('category_id')
-        if not cat_id_a:
-            continue # Skip categories in 'a' that have no ID
-
-        if cat_id_a in category_map:
-            # --- Category exists, merge subcategories ---
-            category_merged = category_map[cat_id_a]
-            
-            # Ensure the merged category has a 'subcategories' list to work with
-            category_merged.setdefault('subcategories', [])
-                
-            subcategory_map = {sub.get('subcategory_id'): sub for sub in category_merged['subcategories'] if sub.get('subcategory_id')}
-            
-            for subcategory_a in category_a.get('subcategories', []):
-                sub_id_a = subcategory_a.get('subcategory_id')
-                if not sub_id_a:
-                    continue # Skip subcategories in 'a' that have no ID
-                
-                cases_to_add = subcategory_a.get('related_case_id', [])
-
-                if sub_id_a in subcategory_map:
-                    # --- Subcategory exists, merge cases ---
-                    subcategory_merged = subcategory_map[sub_id_a]
-                    
-                    if cases_to_add:
-                        # This line safely gets or creates the 'related_case_id' list
-                        # on the destination subcategory before adding new cases to it.
-                        # IT IS THE SOLUTION TO THE PROBLEM.
-                        subcategory_merged.setdefault('related_case_id', []).extend(cases_to_add)
-                
-                else:
-                    # --- New subcategory, add it to the category ---
-                    category_merged['subcategories'].append(subcategory_a)
+    with open(path, 'rb') as f:
+        if ijson is not None:
+            yield from ijson.items(f, 'item', use_float=True)
         else:
-            # --- New category, add it to the main list ---
-            merged_data.append(category_a)
-            category_map[cat_id_a] = category_a
-
-    # --- Sorting Logic (made robust with .get()) ---
-    def get_subcategory_sort_key(subcategory):
-        sid = subcategory.get('subcategory_id', '0-0')
-        return [int(p) for p in sid.split('-')]
-
-    merged_data.sort(key=lambda cat: cat.get('category_id', 0))
-    for category in merged_data:
-        if 'subcategories' in category and category['subcategories']:
-            category['subcategories'].sort(key=get_subcategory_sort_key)
-            
-    return merged_data
+            yield from json.load(f)
+
+
+def expand_inputs(patterns, current_directory):
+    """Expands file names, glob patterns and directories (-> dir/*.json) into a list of files."""
+    paths = []
+    for pattern in patterns:
+        pattern = os.path.join(current_directory, pattern)
+        if os.path.isdir(pattern):
+            pattern = os.path.join(pattern, '*.json')
+        matches = sorted(glob.glob(pattern))
+        if not matches:
+            raise FileNotFoundError(2, 'No such file or pattern', pattern)
+        paths.extend(match for match in matches if match not in paths)
+    return paths
+
+
+def _unique(items):
+    return list(dict.fromkeys(items))
+
+
+class CaseMerger:
+    """
+    Merges any number of category datasets into one, input by input.
+
+    Inputs are consumed one category at a time and nothing is deep-copied, so
+    only the merged result is kept in memory. Within a subcategory each case_id
+    appears once, carrying the union of the tag lists it was given. Names and
+    ordering come from the first input that mentions a category, subcategory or
+    case.
+    """
+
+    def __init__(self):
+        self.categories = {}
+        self.skipped = 0
+
+    def add(self, categories):
+        for category in categories:
+            cat_id = category.get('category_id') if isinstance(category, dict) else None
+            if not cat_id:
+                self.skipped += 1 # Not a category (e.g. a raw crawled case) or no ID
+                continue
+
+            merged = self.categories.get(cat_id)
+            if merged is None:
+                merged = {key: value for key, value in category.items() if key != 'subcategories'}
+                merged['subcategories'] = {}
+                self.categories[cat_id] = merged
+
+            for subcategory in category.get('subcategories') or []:
+                self._add_subcategory(merged['subcategories'], subcategory)
+
+    def _add_subcategory(self, subcategories, subcategory):
+        sub_id = subcategory.get('subcategory_id')
+        if not sub_id:
+            return # Skip subcategories that have no ID
+
+        merged = subcategories.get(sub_id)
+        if merged is None:
+            merged = {key: value for key, value in subcategory.items() if key != 'related_case_id'}
+            subcategories[sub_id] = merged
+
+        if 'related_case_id' not in subcategory:
+            return
+        cases = merged.setdefault('related_case_id', {})
+        for entry in subcategory['related_case_id'] or []:
+            # Entries are {case_id: [tags]}; a few carry several spellings of the same case.
+            for case_id, tags in entry.items():
+                if case_id in cases:
+                    cases[case_id] = _unique(cases[case_id] + list(tags or []))
+                else:
+                    cases[case_id] = _unique(tags or [])
+
+    def iter_merged(self):
+        """Yields the merged categories in category -> subcategory order."""
+        def get_subcategory_sort_key(subcategory):
+            sid = subcategory.get('subcategory_id', '0-0')
+            return [int(p) for p in sid.split('-')]
+
+        for cat_id in sorted(self.categories):
+            merged = self.categories[cat_id]
+            category = dict(merged)
+            subcategories = []
+            for subcategory in sorted(merged['subcategories'].values(), key=get_subcategory_sort_key):
+                if 'related_case_id' in subcategory:
+                    subcategory = dict(subcategory)
+                    subcategory['related_case_id'] = [
+                        {case_id: tags} for case_id, tags in subcategory['related_case_id'].items()
+                    ]
+                subcategories.append(subcategory)
+            category['subcategories'] = subcategories
+            yield category
+
+    def count_cases(self):
+        return sum(
+            len(subcategory.get('related_case_id', ()))
+            for category in self.categories.values()
+            for subcategory in category['subcategories'].values()
+        )
+
+
+def write_merged(categories, f_out, indent=2):
+    """Writes categories as a JSON list, one category at a time (same layout as json.dump with `indent`)."""
+    pad = ' ' * indent
+    f_out.write('[')
+    first = True
+    for category in categories:
+        f_out.write('\n' + pad if first else ',\n' + pad)
+        f_out.write(json.dumps(category, indent=indent, ensure_ascii=False).replace('\n', '\n' + pad))
+        first = False
+    f_out.write(']' if first else '\n]')
+
+
+def merge_data(a, b):
+    """
+    Merges dataset 'a' into dataset 'b'.
+    Cases are deduplicated per subcategory by case_id, with their tag lists unioned.
+    """
+    merger = CaseMerger()
+    merger.add(b)
+    merger.add(a)
+    return list(merger.iter_merged())
+
+
+def peak_memory_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes on Linux.
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
 
 def main():
     """
     Main function to handle command-line arguments, file I/O, and orchestration.
     """
     parser = argparse.ArgumentParser(
-        description="Merge two JSON datasets (a and b) from the current working directory.",
+        description="Merge any number of category JSON datasets from the current working directory.\n"
+                    "Inputs can be files, glob patterns (quote them) or directories.\n\n"
+                    "  python merge_cases.py jcase_merged.json 'splitted_jcases/*.json' --output_file merged.json",
         formatter_class=argparse.RawTextHelpFormatter
     )
+    parser.add_argument("inputs", nargs='*', help="Datasets to merge, in precedence order. Defaults to --file_b then --file_a.")
     parser.add_argument("--file_a", default="a.json", help="Filename of the source dataset (default: a.json).")
     parser.add_argument("--file_b", default="b.json", help="Filename of the base dataset to merge into (default: b.json).")
     parser.add_argument("--output_file", default="merged_data.json", help="Filename for the merged output file (default: merged_data.json).")
@@ -79,43 +181,43 @@ def main():
     current_directory = os.getcwd()
     print(f"Operating in directory: {current_directory}\n")
 
-    path_a = os.path.join(current_directory, args.file_a)
-    path_b = os.path.join(current_directory, args.file_b)
     path_output = os.path.join(current_directory, args.output_file)
+    started = time.perf_counter()
+    merger = CaseMerger()
 
     try:
-        print(f"Loading source data from: {path_a}")
-        with open(path_a, 'r', encoding='utf-8') as f:
-            data_a = json.load(f)
-
-        print(f"Loading base data from: {path_b}")
-        with open(path_b, 'r', encoding='utf-8') as f:
-            data_b = json.load(f)
-            
+        paths = expand_inputs(args.inputs or [args.file_b, args.file_a], current_directory)
+        for path in paths:
+            skipped_before = merger.skipped
+            merger.add(iter_categories(path))
+            skipped = merger.skipped - skipped_before
+            print(f"Merged {os.path.relpath(path, current_directory)}" + (f" (skipped {skipped} non-category entries)" if skipped else ""))
+
     except FileNotFoundError as e:
         print(f"Error: Input file not found at '{e.filename}'. Please check the path and filenames.", file=sys.stderr)
         sys.exit(1)
-    except json.JSONDecodeError as e:
+    except DECODE_ERRORS as e:
         print(f"Error: Could not decode JSON from a file. Malformed JSON detected.\nDetails: {e}", file=sys.stderr)
         sys.exit(1)
     except Exception as e:
         print(f"An unexpected error occurred during file loading: {e}", file=sys.stderr)
         sys.exit(1)
 
-    print("\nMerging data...")
-    final_data = merge_data(data_a, data_b)
-    print("Merge complete.")
+    print(f"\nMerge complete: {len(paths)} files, {len(merger.categories)} categories, {merger.count_cases()} unique cases.")
 
     try:
         print(f"Saving merged data to: {path_output}")
         with open(path_output, 'w', encoding='utf-8') as f_out:
-            json.dump(final_data, f_out, indent=2, ensure_ascii=False)
+            write_merged(merger.iter_merged(), f_out)
     except Exception as e:
         print(f"An unexpected error occurred while saving the file: {e}", file=sys.stderr)
         sys.exit(1)
-        
+
+    elapsed = time.perf_counter() - started
+    peak = peak_memory_mb()
+    print(f"Took {elapsed:.2f}s" + (f", peak memory {peak:.1f} MB" if peak is not None else ""))
     print("\n✅ Success! Merged data has been saved.")
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,50 +1,222 @@
 
 
+import argparse
 import json
 import os
+import shutil
+import tempfile
+from collections import defaultdict
 
-def split_json(input_file, output_dir, chunk_size=100):
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+MANIFEST_FILENAME = 'manifest.json'
+
+# Errors that mean the input is not a valid JSON list.
+DECODE_ERRORS = (json.JSONDecodeError, ValueError) + ((ijson.JSONError,) if ijson is not None else ())
+
+
+def iter_cases(input_file):
+    """Yields the cases of a JSON list one at a time, without loading the whole file."""
+    with open(input_file, 'rb') as f:
+        if ijson is not None:
+            yield from ijson.items(f, 'item', use_float=True)
+        else:
+            print("Warning: ijson is not installed, loading the whole input into memory.")
+            yield from json.load(f)
+
+
+class _ChunkWriter:
+    """Writes one chunk file in the same layout as json.dump(..., indent=4) and tracks item offsets."""
+
+    def __init__(self, path):
+        self.path = path
+        self.f = open(path, 'wb')
+        self.f.write(b'[')
+        self.size = 1
+        self.count = 0
+
+    def write(self, encoded):
+        """Appends an encoded case and returns its (offset, length) within the file."""
+        separator = b',\n    ' if self.count else b'\n    '
+        self.f.write(separator)
+        offset = self.size + len(separator)
+        self.f.write(encoded)
+        self.size = offset + len(encoded)
+        self.count += 1
+        return offset, len(encoded)
+
+    def close(self):
+        self.f.write(b'\n]' if self.count else b']')
+        self.f.close()
+
+
+def split_json(input_file, output_dir, chunk_size=100, chunk_bytes=None):
     """
     Splits a large JSON file containing a list of objects into smaller files.
 
+    The input is parsed incrementally, so only the case being written is in
+    memory. Alongside the chunks a manifest is written that maps every case_id
+    to its chunk file and the byte offset/length of the case inside it (see
+    CaseLookup).
+
+    Chunks and manifest are written to a staging directory first and only
+    moved into `output_dir` once the whole input has been read, so a malformed
+    input leaves an earlier split untouched.
+
     Args:
         input_file (str): Path to the input JSON file.
         output_dir (str): Directory to save the split files.
         chunk_size (int): Number of cases per output file.
+        chunk_bytes (int): If set, start a new file once a chunk would exceed
+            this many bytes instead of counting cases.
     """
     # Create the output directory if it doesn't exist
     if not os.path.exists(output_dir):
         os.makedirs(output_dir)
         print(f"Created directory: {output_dir}")
 
-    # Read the large JSON file
-    try:
-        with open(input_file, 'r', encoding='utf-8') as f:
-            all_cases = json.load(f)
-        print(f"Successfully loaded {len(all_cases)} cases from {input_file}")
-    except FileNotFoundError:
+    if not os.path.exists(input_file):
         print(f"Error: Input file not found at {input_file}")
         return
-    except json.JSONDecodeError:
-        print(f"Error: Could not decode JSON from {input_file}")
+
+    chunks = []
+    manifest = {}
+    duplicates = 0
+    writer = None
+    total = 0
+    staging_dir = tempfile.mkdtemp(prefix='.split-', dir=output_dir)
+
+    def finish_chunk():
+        writer.close()
+        print(f"Saved {writer.count} cases to {os.path.join(output_dir, os.path.basename(writer.path))}")
+
+    try:
+        for case in iter_cases(input_file):
+            encoded = json.dumps(case, ensure_ascii=False, indent=4).replace('\n', '\n    ').encode('utf-8')
+
+            if writer is not None:
+                if chunk_bytes:
+                    full = writer.size + len(encoded) + 8 > chunk_bytes
+                else:
+                    full = writer.count >= chunk_size
+                if full:
+                    finish_chunk()
+                    writer = None
+            if writer is None:
+                chunk_name = f'jcases_{len(chunks) + 1}.json'
+                chunks.append(chunk_name)
+                writer = _ChunkWriter(os.path.join(staging_dir, chunk_name))
+
+            offset, length = writer.write(encoded)
+            total += 1
+            case_id = case.get('case_id') if isinstance(case, dict) else None
+            if case_id:
+                if case_id in manifest:
+                    duplicates += 1 # Keep the first occurrence
+                else:
+                    manifest[case_id] = [len(chunks) - 1, offset, length]
+        if writer is not None:
+            finish_chunk()
+
+        with open(os.path.join(staging_dir, MANIFEST_FILENAME), 'w', encoding='utf-8') as f:
+            json.dump({'chunks': chunks, 'cases': manifest}, f, ensure_ascii=False)
+
+        # The manifest goes last so it never points at chunks that aren't in place yet.
+        for name in chunks + [MANIFEST_FILENAME]:
+            os.replace(os.path.join(staging_dir, name), os.path.join(output_dir, name))
+    except DECODE_ERRORS as e:
+        print(f"Error: Could not decode JSON from {input_file}: {e}")
         return
+    finally:
+        if writer is not None and not writer.f.closed:
+            writer.f.close()
+        shutil.rmtree(staging_dir, ignore_errors=True)
+
+    manifest_path = os.path.join(output_dir, MANIFEST_FILENAME)
+    print(f"Indexed {len(manifest)} case_ids in {manifest_path}" + (f" ({duplicates} duplicates skipped)" if duplicates else ""))
+
+    print(f"\nSplitting complete. {total} cases in {len(chunks)} files.")
+
+
+class CaseLookup:
+    """
+    Random access to split cases by case_id through the manifest.
 
-    # Split the data and write to new files
-    for i in range(0, len(all_cases), chunk_size):
-        chunk = all_cases[i:i + chunk_size]
-        file_number = (i // chunk_size) + 1
-        output_filename = os.path.join(output_dir, f'jcases_{file_number}.json')
-        
-        with open(output_filename, 'w', encoding='utf-8') as f:
-            json.dump(chunk, f, ensure_ascii=False, indent=4)
-        
-        print(f"Saved {len(chunk)} cases to {output_filename}")
+    A single lookup is one seek + read of exactly the case's bytes. Batch
+    lookups are grouped by chunk file and read in offset order, so each chunk
+    is opened once.
+    """
+
+    def __init__(self, output_dir):
+        self.output_dir = output_dir
+        with open(os.path.join(output_dir, MANIFEST_FILENAME), 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        self.chunks = manifest['chunks']
+        self.cases = manifest['cases']
+
+    def __contains__(self, case_id):
+        return case_id in self.cases
+
+    def __len__(self):
+        return len(self.cases)
+
+    def locate(self, case_id):
+        """Returns (chunk path, offset, length) for a case_id, or None."""
+        entry = self.cases.get(case_id)
+        if entry is None:
+            return None
+        chunk_index, offset, length = entry
+        return os.path.join(self.output_dir, self.chunks[chunk_index]), offset, length
+
+    def get(self, case_id):
+        """Returns a single case, or None if the case_id is unknown."""
+        location = self.locate(case_id)
+        if location is None:
+            return None
+        path, offset, length = location
+        with open(path, 'rb') as f:
+            f.seek(offset)
+            return json.loads(f.read(length))
+
+    def get_many(self, case_ids):
+        """Returns {case_id: case} for the known case_ids, reading each chunk file once."""
+        by_chunk = defaultdict(list)
+        for case_id in dict.fromkeys(case_ids):
+            entry = self.cases.get(case_id)
+            if entry is not None:
+                by_chunk[entry[0]].append((entry[1], entry[2], case_id))
+
+        found = {}
+        for chunk_index, entries in by_chunk.items():
+            with open(os.path.join(self.output_dir, self.chunks[chunk_index]), 'rb') as f:
+                for offset, length, case_id in sorted(entries):
+                    f.seek(offset)
+                    found[case_id] = json.loads(f.read(length))
+        return found
 
-    print("\nSplitting complete.")
 
 if __name__ == '__main__':
     INPUT_JSON_FILE = '/Users/kelvin/Documents/GitHub/lawai_2.0/knowlegebase_crawler/judicial_cases.json'
     OUTPUT_DIRECTORY = '/Users/kelvin/Documents/GitHub/lawai_2.0/knowlegebase_crawler/splitted_jcases'
-    
-    split_json(INPUT_JSON_FILE, OUTPUT_DIRECTORY)
 
+    parser = argparse.ArgumentParser(description="Split a crawled case list into chunk files with a case_id manifest.")
+    parser.add_argument("--input", default=INPUT_JSON_FILE, help="Crawled cases JSON list.")
+    parser.add_argument("--output_dir", default=OUTPUT_DIRECTORY, help="Directory for the chunk files and manifest.")
+    parser.add_argument("--chunk_size", type=int, default=100, help="Cases per chunk file (default: 100).")
+    parser.add_argument("--chunk_bytes", type=int, default=None, help="Split by size instead: maximum bytes per chunk file.")
+    parser.add_argument("--find", nargs='+', metavar="CASE_ID", help="Look up cases in an existing split instead of splitting.")
+    args = parser.parse_args()
+
+    if args.find:
+        lookup = CaseLookup(args.output_dir)
+        found = lookup.get_many(args.find)
+        for case_id in args.find:
+            if case_id in found:
+                print(json.dumps(found[case_id], ensure_ascii=False, indent=4))
+            else:
+                print(f"Not found: {case_id}")
+    else:
+        split_json(args.input, args.output_dir, chunk_size=args.chunk_size, chunk_bytes=args.chunk_bytes)
@@ -0,0 +1,419 @@
+import argparse
+import csv
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+# Embedding fields of case_2 and their dimensions, in the priority order
+# match_cases_multi_field_v3 uses to pick the field the threshold applies to.
+FIELDS = {
+    'content': 1536,
+    'dispute': 512,
+    'opinion': 512,
+    'result': 512,
+}
+DEFAULT_FIELD_WEIGHTS = {'content': 0.4, 'dispute': 0.3, 'opinion': 0.2, 'result': 0.1}
+DEFAULT_MATCH_THRESHOLD = 0.3
+DEFAULT_MATCH_COUNT = 50
+DEFAULT_N_PROBE = 8
+BLOCK_ROWS = 8192       # rows scored per matrix product, bounding the float32 working set
+
+META_FILENAME = 'meta.json'
+CASE_IDS_FILENAME = 'case_ids.json'
+OFFSETS_FILENAME = 'offsets.npy'
+CURRENT_FILENAME = 'CURRENT'
+
+
+def _parse_vector(value, dim, field, case_id):
+    """Returns a unit float32 vector from a list, array or pgvector text such as '[0.1,0.2]'; zeros if missing."""
+    if isinstance(value, str):
+        value = json.loads(value) if value.strip() else None
+    if value is None:
+        return np.zeros(dim, dtype=np.float32)
+    vector = np.asarray(value, dtype=np.float32)
+    if vector.shape != (dim,):
+        raise ValueError(f"{case_id}: {field}_embedding has shape {vector.shape}, expected ({dim},)")
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def iter_snapshot(path):
+    """
+    Yields the rows of an exported case_2 snapshot, as JSON Lines or CSV, with
+    `case_id` and `<field>_embedding` columns (vectors as lists or pgvector text).
+    """
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        if path.endswith('.csv'):
+            csv.field_size_limit(sys.maxsize)
+            yield from csv.DictReader(f)
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def _field_path(directory, field):
+    return os.path.join(directory, f'{field}.f16')
+
+
+def _centroids_path(directory, field):
+    return os.path.join(directory, f'centroids_{field}.npy')
+
+
+def _concat(matrices, rows):
+    return np.hstack([matrix[rows].astype(np.float32) for matrix in matrices])
+
+
+def _train_partitions(matrices, count, partitions, sample_size, iterations, rng):
+    """Spherical k-means over the concatenated fields of a sample of rows; returns unit centroids."""
+    sample = np.sort(rng.choice(count, size=min(count, sample_size), replace=False))
+    data = _concat(matrices, sample)
+    data /= np.maximum(np.linalg.norm(data, axis=1, keepdims=True), 1e-12)
+    centroids = data[rng.choice(len(data), size=partitions, replace=False)]
+    for _ in range(iterations):
+        assignment = np.argmax(data @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, data)
+        empty = ~sums.any(axis=1)
+        sums[empty] = data[rng.choice(len(data), size=int(empty.sum()))]
+        centroids = sums / np.maximum(np.linalg.norm(sums, axis=1, keepdims=True), 1e-12)
+    return centroids
+
+
+def build_index(records, directory, partitions=None, sample_size=10000, iterations=10, seed=0):
+    """
+    Builds an index in `directory` (which must not exist yet) from snapshot rows.
+
+    Rows are streamed to disk as unit float16 vectors, one raw matrix per field
+    (a missing embedding is a zero row and scores 0, like the SQL function's
+    NULL handling). The rows are then clustered into `partitions` coarse
+    partitions (about sqrt(rows) by default) and rewritten grouped by
+    partition, so probing a partition reads one contiguous slice of each
+    memory-mapped matrix. Returns the number of indexed cases.
+    """
+    os.makedirs(directory)
+    staging = tempfile.mkdtemp(prefix='.raw-', dir=directory)
+    case_ids = []
+    files = {field: open(_field_path(staging, field), 'wb') for field in FIELDS}
+    try:
+        for record in records:
+            case_id = record.get('case_id')
+            if not case_id:
+                continue
+            for field, dim in FIELDS.items():
+                vector = _parse_vector(record.get(f'{field}_embedding'), dim, field, case_id)
+                files[field].write(vector.astype(np.float16).tobytes())
+            case_ids.append(case_id)
+    finally:
+        for f in files.values():
+            f.close()
+
+    count = len(case_ids)
+    if not count:
+        shutil.rmtree(directory)
+        raise ValueError("No cases with a case_id in the snapshot")
+    raw = [np.memmap(_field_path(staging, field), dtype=np.float16, mode='r', shape=(count, dim))
+           for field, dim in FIELDS.items()]
+    partitions = min(count, partitions or max(1, int(round(count ** 0.5))))
+    rng = np.random.default_rng(seed)
+    centroids = _train_partitions(raw, count, partitions, sample_size, iterations, rng)
+
+    assignment = np.empty(count, dtype=np.int64)
+    for start in range(0, count, BLOCK_ROWS):
+        rows = np.arange(start, min(count, start + BLOCK_ROWS))
+        assignment[rows] = np.argmax(_concat(raw, rows) @ centroids.T, axis=1)
+    order = np.argsort(assignment, kind='stable')
+    offsets = np.concatenate([[0], np.cumsum(np.bincount(assignment, minlength=partitions))])
+
+    for (field, dim), source in zip(FIELDS.items(), raw):
+        matrix = np.memmap(_field_path(directory, field), dtype=np.float16, mode='w+', shape=(count, dim))
+        for start in range(0, count, BLOCK_ROWS):
+            matrix[start:start + BLOCK_ROWS] = source[order[start:start + BLOCK_ROWS]]
+        matrix.flush()
+        # Partition means: the expected field similarity of a partition's rows, used to choose what to probe.
+        means = np.zeros((partitions, dim), dtype=np.float32)
+        for partition in range(partitions):
+            start, end = offsets[partition], offsets[partition + 1]
+            if end > start:
+                means[partition] = matrix[start:end].astype(np.float32).mean(axis=0)
+        np.save(_centroids_path(directory, field), means)
+        del matrix
+    del raw
+    shutil.rmtree(staging)
+
+    np.save(os.path.join(directory, OFFSETS_FILENAME), offsets)
+    with open(os.path.join(directory, CASE_IDS_FILENAME), 'w', encoding='utf-8') as f:
+        json.dump([case_ids[row] for row in order], f, ensure_ascii=False)
+    with open(os.path.join(directory, META_FILENAME), 'w', encoding='utf-8') as f:
+        json.dump({'fields': FIELDS, 'count': count, 'partitions': partitions, 'dtype': 'float16'}, f)
+    return count
+
+
+class VectorIndex:
+    """
+    Read-only multi-field vector index over memory-mapped float16 matrices.
+
+    Scores are the weighted sum of per-field cosine similarities that
+    match_cases_multi_field_v3 reports as weighted_similarity, and results are
+    ranked by it for every query rather than by the primary field alone. As in
+    the SQL function, fields missing from the query score 0, and
+    `match_threshold` applies to the similarity of the first field the query
+    has (content > dispute > opinion > result).
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, META_FILENAME), 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        with open(os.path.join(directory, CASE_IDS_FILENAME), 'r', encoding='utf-8') as f:
+            self.case_ids = json.load(f)
+        self.count = meta['count']
+        self.partitions = meta['partitions']
+        self.offsets = np.load(os.path.join(directory, OFFSETS_FILENAME))
+        self.matrices = {
+            field: np.memmap(_field_path(directory, field), dtype=np.float16, mode='r', shape=(self.count, dim))
+            for field, dim in meta['fields'].items()
+        }
+        self.centroids = {field: np.load(_centroids_path(directory, field)) for field in self.matrices}
+
+    def __len__(self):
+        return self.count
+
+    def _ranges(self, weights, vectors, n_probe):
+        """Row ranges to score: the `n_probe` partitions with the best weighted centroid score, or everything."""
+        if n_probe is None or n_probe >= self.partitions:
+            ranges = [(0, self.count)]
+        else:
+            scores = sum(weights[field] * (self.centroids[field] @ vector) for field, vector in vectors.items())
+            probed = np.sort(np.argpartition(-scores, n_probe - 1)[:n_probe])
+            ranges = [(self.offsets[p], self.offsets[p + 1]) for p in probed if self.offsets[p + 1] > self.offsets[p]]
+        return [(start, min(end, start + BLOCK_ROWS)) for begin, end in ranges for start in range(begin, end, BLOCK_ROWS)]
+
+    def search(self, query, field_weights=None, match_count=DEFAULT_MATCH_COUNT,
+               match_threshold=DEFAULT_MATCH_THRESHOLD, n_probe=DEFAULT_N_PROBE):
+        """
+        Returns up to `match_count` cases for `query` ({field: vector}, e.g.
+        {'content': [...], 'dispute': [...]}) as dicts with case_id, the four
+        <field>_similarity values and weighted_similarity, best first.
+
+        `field_weights` overrides DEFAULT_FIELD_WEIGHTS per field. n_probe=None
+        scores every row (exact brute force).
+        """
+        weights = dict(DEFAULT_FIELD_WEIGHTS, **(field_weights or {}))
+        vectors = {
+            field: _parse_vector(query[field], dim, field, 'query')
+            for field, dim in FIELDS.items() if query.get(field) is not None
+        }
+        if not vectors:
+            raise ValueError(f"Query has none of the fields: {', '.join(FIELDS)}")
+        primary = next(iter(vectors))
+
+        rows, similarities = [], {field: [] for field in vectors}
+        for start, end in self._ranges(weights, vectors, n_probe):
+            rows.append(np.arange(start, end))
+            for field, vector in vectors.items():
+                # float16 has no BLAS matmul; one float32 block is far faster than scoring in float16.
+                similarities[field].append(self.matrices[field][start:end].astype(np.float32) @ vector)
+        rows = np.concatenate(rows)
+        similarities = {field: np.concatenate(values) for field, values in similarities.items()}
+        weighted = sum(weights[field] * values for field, values in similarities.items())
+
+        keep = np.flatnonzero(similarities[primary] > match_threshold)
+        if len(keep) > match_count:
+            keep = keep[np.argpartition(-weighted[keep], match_count - 1)[:match_count]]
+        keep = keep[np.argsort(-weighted[keep], kind='stable')]
+
+        return [
+            dict(
+                case_id=self.case_ids[rows[i]],
+                **{f'{field}_similarity': float(similarities[field][i]) if field in similarities else 0.0
+                   for field in FIELDS},
+                weighted_similarity=float(weighted[i]),
+            )
+            for i in keep
+        ]
+
+
+def publish_index(records, root, keep=2, **build_options):
+    """
+    Builds a new index version under `root` and makes it current.
+
+    The version is built in a staging directory, renamed into place, and only
+    then named in root/CURRENT (replaced atomically), so a LiveVectorIndex never
+    sees a half-built index. All but the `keep` newest versions are removed;
+    processes still searching an old version keep their open mappings.
+    """
+    os.makedirs(root, exist_ok=True)
+    staging = os.path.join(tempfile.mkdtemp(prefix='.build-', dir=root), 'index')
+    count = build_index(records, staging, **build_options)
+    name = time.strftime('%Y%m%d-%H%M%S') + f'-{time.time_ns() % 10**9:09d}'
+    os.replace(staging, os.path.join(root, name))
+    shutil.rmtree(os.path.dirname(staging))
+
+    current_tmp = os.path.join(root, CURRENT_FILENAME + '.tmp')
+    with open(current_tmp, 'w', encoding='utf-8') as f:
+        f.write(name + '\n')
+    os.replace(current_tmp, os.path.join(root, CURRENT_FILENAME))
+
+    versions = sorted(entry for entry in os.listdir(root)
+                      if not entry.startswith('.') and os.path.isdir(os.path.join(root, entry)))
+    for old in versions[:-keep] if keep else []:
+        if old != name:
+            shutil.rmtree(os.path.join(root, old), ignore_errors=True)
+    return name, count
+
+
+class LiveVectorIndex:
+    """
+    The current version of a published index, swapped for a newer one without
+    restarting: like CategoryIndex.refresh(), root/CURRENT is checked at most
+    once per `check_interval` seconds. Searches already running keep the index
+    they started with.
+    """
+
+    def __init__(self, root, check_interval=5.0):
+        self.root = root
+        self.check_interval = check_interval
+        self.version = None
+        self.index = None
+        self._reload_lock = threading.Lock()
+        self._checked_at = 0.0
+        self.refresh(force=True)
+
+    def _current_version(self):
+        with open(os.path.join(self.root, CURRENT_FILENAME), 'r', encoding='utf-8') as f:
+            return f.read().strip()
+
+    def refresh(self, force=False):
+        """Opens the current version if it changed since the last check. Returns True if it was swapped in."""
+        if not force and time.monotonic() - self._checked_at < self.check_interval:
+            return False
+        with self._reload_lock:
+            now = time.monotonic()
+            if not force and now - self._checked_at < self.check_interval:
+                return False
+            self._checked_at = now
+            version = self._current_version()
+            if version == self.version:
+                return False
+            self.index = VectorIndex(os.path.join(self.root, version))
+            self.version = version
+            return True
+
+    def search(self, query, **options):
+        self.refresh()
+        return self.index.search(query, **options)
+
+
+def synthetic_corpus(count, topics=64, noise=0.8, missing=0.1, seed=0):
+    """
+    Yields case_2-like rows with clustered random embeddings: every case has a
+    topic whose per-field centre it is scattered around, and each 512-d field
+    is missing with probability `missing`.
+    """
+    rng = np.random.default_rng(seed)
+    centres = {field: rng.standard_normal((topics, dim)).astype(np.float32) for field, dim in FIELDS.items()}
+    for number in range(count):
+        topic = rng.integers(topics)
+        record = {'case_id': f'synthetic-{number}'}
+        for field, dim in FIELDS.items():
+            if field != 'content' and rng.random() < missing:
+                continue
+            record[f'{field}_embedding'] = centres[field][topic] + noise * rng.standard_normal(dim).astype(np.float32)
+        yield record
+
+
+def _percentile(values, percent):
+    return float(np.percentile(values, percent)) * 1000 if values else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the multi-field vector index and benchmark it against exact brute force.")
+    parser.add_argument("--snapshot", default=None, help="Exported case_2 snapshot (.jsonl or .csv) to index; a synthetic corpus is used when omitted.")
+    parser.add_argument("--root", default=None, help="Index root to publish into (default: a temporary directory).")
+    parser.add_argument("--cases", type=int, default=20000, help="Synthetic corpus size (default: 20000).")
+    parser.add_argument("--queries", type=int, default=200, help="Benchmark queries (default: 200).")
+    parser.add_argument("--n-probe", type=int, nargs='+', default=[2, 4, DEFAULT_N_PROBE, 16], help="Partitions probed per query.")
+    parser.add_argument("--k", type=int, default=10, help="Recall is measured on the top k (default: 10).")
+    parser.add_argument("--min-recall", type=float, default=0.9, help=f"Fail if recall at n_probe={DEFAULT_N_PROBE} is lower (default: 0.9).")
+    args = parser.parse_args()
+
+    root = args.root or tempfile.mkdtemp(prefix='vector-index-')
+    problems = []
+    if args.snapshot:
+        records = lambda: iter_snapshot(args.snapshot)
+    else:
+        records = lambda: synthetic_corpus(args.cases)
+
+    started = time.perf_counter()
+    version, count = publish_index(records(), root)
+    print(f"Built {version} in {time.perf_counter() - started:.1f}s: {count} cases in {root}")
+    live = LiveVectorIndex(root)
+    index = live.index
+    print(f"  {index.partitions} partitions, {sum(m.nbytes for m in index.matrices.values()) / 2**20:.0f} MB of float16 vectors\n")
+
+    # Queries are perturbed copies of indexed cases, some with only a content vector.
+    rng = np.random.default_rng(1)
+    queries = []
+    for row in rng.choice(count, size=min(args.queries, count), replace=False):
+        query = {}
+        for field, matrix in index.matrices.items():
+            vector = matrix[row].astype(np.float32)
+            if vector.any() and (field == 'content' or len(queries) % 3):
+                query[field] = vector + 0.03 * rng.standard_normal(len(vector)).astype(np.float32)
+        queries.append(query)
+
+    exact, exact_times = [], []
+    for query in queries:
+        started = time.perf_counter()
+        exact.append([r['case_id'] for r in index.search(query, match_count=args.k, n_probe=None)])
+        exact_times.append(time.perf_counter() - started)
+    print(f"{'exact':>10}  p50 {_percentile(exact_times, 50):7.2f} ms  p95 {_percentile(exact_times, 95):7.2f} ms")
+
+    for n_probe in args.n_probe:
+        found, times = 0, []
+        for query, expected in zip(queries, exact):
+            started = time.perf_counter()
+            results = index.search(query, match_count=args.k, n_probe=n_probe)
+            times.append(time.perf_counter() - started)
+            found += len(set(expected) & {r['case_id'] for r in results})
+        recall = found / max(1, sum(len(expected) for expected in exact))
+        print(f"{f'n_probe={n_probe}':>10}  p50 {_percentile(times, 50):7.2f} ms  p95 {_percentile(times, 95):7.2f} ms  "
+              f"recall@{args.k} {recall:.3f}")
+        if n_probe == DEFAULT_N_PROBE and recall < args.min_recall:
+            problems.append(f"recall@{args.k} {recall:.3f} at n_probe={n_probe} is below {args.min_recall}")
+
+    # Hot swap: publish half the cases as a new version; searches move to it while the old index still answers.
+    live.check_interval = 0
+    old_index = index
+    publish_index((
+        {'case_id': case_id, **{f'{field}_embedding': old_index.matrices[field][row] for field in FIELDS}}
+        for row, case_id in enumerate(old_index.case_ids[:count // 2])
+    ), root)
+    live.search(queries[0], match_count=1)
+    if live.index is old_index or len(live.index) != count // 2:
+        problems.append("publishing a new version did not swap the live index")
+    elif not old_index.search(queries[0], match_count=1):
+        problems.append("the previous index stopped answering after the swap")
+    else:
+        print(f"\nHot swap: {len(old_index)} -> {len(live.index)} cases without reopening the LiveVectorIndex")
+
+    if not args.root:
+        shutil.rmtree(root, ignore_errors=True)
+    if problems:
+        print(f"\n❌ {len(problems)} problems:")
+        for problem in problems:
+            print(f"  - {problem}")
+    else:
+        print("\n✅ Partitioned search matches brute force within the recall target, and versions hot-swap.")
+    sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()